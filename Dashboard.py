@@ -5,8 +5,15 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
+import hmac
+import os
 import time
 import warnings
+from policy_store import PolicyEventStore
+from strategy_optimizer import optimize_portfolio
+from session_guard import SessionGuard, current_session_id
+from survey_estimation import SurveyDesign, simulate_survey
+from territorial_data import read_territorial_history, territorial_history
 warnings.filterwarnings('ignore')
 
 # Configuration de la page
@@ -66,13 +73,147 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Fichier de persistance des mesures de politique tabac
+POLICY_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'policy_events.json')
+
+@st.cache_resource
+def load_policy_store(path, _default_events):
+    """Charge le référentiel des mesures une seule fois pour toutes les sessions"""
+    store = PolicyEventStore(path)
+    if len(store) == 0:
+        store.add_events(_default_events, persist=False)
+    return load_session_guard().share(store)
+
+# Historique territoire x année x indicateur (Parquet ou CSV, format long) ; à défaut, extrapolation
+TERRITORIAL_HISTORY_PATH = os.environ.get('DASHBOARD_TERRITORIAL_PATH', '')
+
+@st.cache_resource
+def load_territorial_history(path):
+    """Charge une seule fois l'historique territorial réel pour toutes les sessions"""
+    return load_session_guard().share(read_territorial_history(path))
+
+# Micro-données d'enquête (Parquet ou CSV) ; à défaut, enquête simulée calée sur les séries nationales
+SURVEY_MICRODATA_PATH = os.environ.get('DASHBOARD_SURVEY_PATH', '')
+SURVEY_LABEL = 'enquête' if SURVEY_MICRODATA_PATH else 'enquête simulée'
+
+@st.cache_resource
+def load_survey_design(path, _territorial_history, _historical_data, _social_indicators):
+    """Charge les micro-données d'enquête et calcule une seule fois les poids de réplication"""
+    if path.endswith('.parquet'):
+        microdata = pd.read_parquet(path)
+    elif path:
+        microdata = pd.read_csv(path)
+    else:
+        microdata = simulate_survey(_territorial_history, _historical_data, _social_indicators)
+    return load_session_guard().share(SurveyDesign(microdata, n_replicates=200, method='bootstrap'))
+
+@st.cache_data(max_entries=64)
+def survey_estimates(_design, path, value, by):
+    """Estimations pondérées avec IC 95 %, mises en cache par stratification"""
+    estimates = _design.estimate(value, by)
+    estimates['erreur_haut'] = estimates['ic_haut'] - estimates['estimation']
+    estimates['erreur_bas'] = estimates['estimation'] - estimates['ic_bas']
+    return estimates
+
+@st.cache_resource
+def load_session_guard():
+    """Régulateur de reruns partagé, avec export des métriques Prometheus en local"""
+    guard = SessionGuard()
+    guard.start_metrics_server(int(os.environ.get('DASHBOARD_METRICS_PORT', 9464)))
+    return guard
+
+@st.cache_data(max_entries=256)
+def optimize_strategy_portfolio(strategy_df, territorial_df, budget, min_acceptabilite,
+                                max_strategies, territory_caps=None):
+    """Portefeuille optimal de stratégies par territoire, mis en cache par jeu de paramètres"""
+    return optimize_portfolio(strategy_df, territorial_df, budget, min_acceptabilite,
+                              max_strategies, territory_caps)
+
+# Libellés des indicateurs territoriaux suivis dans le temps
+TERRITORIAL_INDICATORS = {
+    'prevalence': 'Prévalence du tabagisme (%)',
+    'fumeurs_quotidiens': 'Fumeurs quotidiens (%)',
+    'cigarettes_jour': 'Cigarettes par jour (moyenne)',
+    'tabagisme_passif': 'Tabagisme passif (%)',
+    'mortalite_tabac': 'Mortalité liée au tabac (pour 100k hab.)',
+    'prise_charge_tabac': 'Prise en charge tabac (%)'
+}
+
+@st.cache_data(max_entries=16)
+def build_territorial_bar_animation(history_df, indicateur):
+    """Classement des territoires pour un indicateur, une image par année (animation côté navigateur)"""
+    data = history_df[history_df['indicateur'] == indicateur].sort_values(['annee', 'territoire'])
+    # Ordre et échelles fixes pour que les barres restent comparables d'une année à l'autre
+    order = data[data['annee'] == data['annee'].max()].sort_values('valeur')['territoire'].tolist()
+    label = TERRITORIAL_INDICATORS.get(indicateur, indicateur)
+    
+    fig = px.bar(data, 
+                x='valeur', 
+                y='territoire',
+                orientation='h',
+                animation_frame='annee',
+                title=f"{label} par Territoire - {data['annee'].min()}-{data['annee'].max()}",
+                color='valeur',
+                color_continuous_scale='RdYlGn_r',
+                range_x=[0, data['valeur'].max() * 1.1],
+                range_color=[data['valeur'].min(), data['valeur'].max()],
+                category_orders={'territoire': order[::-1]},
+                labels={'valeur': label, 'annee': 'Année'})
+    fig.update_layout(height=550)
+    return fig
+
+@st.cache_data(max_entries=4)
+def build_territorial_map_animation(history_df, coords_df):
+    """Carte de la prévalence par territoire, une image par année"""
+    data = history_df[history_df['indicateur'] == 'prevalence'].merge(coords_df, on='territoire')
+    data = data.sort_values(['annee', 'territoire']).rename(columns={'valeur': 'prevalence_tabac'})
+    
+    fig = px.scatter_geo(data,
+                        lat='lat',
+                        lon='lon',
+                        color='prevalence_tabac',
+                        size='prevalence_tabac',
+                        hover_name='territoire',
+                        hover_data={'prevalence_tabac': True, 'lat': False, 'lon': False},
+                        animation_frame='annee',
+                        title=f"Prévalence du Tabagisme par Territoire (%) - {data['annee'].min()}-{data['annee'].max()}",
+                        color_continuous_scale='RdYlGn_r',
+                        range_color=[data['prevalence_tabac'].min(), data['prevalence_tabac'].max()],
+                        size_max=20,
+                        projection='natural earth')
+    
+    # Configuration de la carte
+    fig.update_geos(
+        visible=True,
+        showcountries=True,
+        countrycolor="black",
+        showsubunits=True,
+        subunitcolor="blue",
+        landcolor="lightgray",
+        oceancolor="lightblue",
+        bgcolor="white"
+    )
+    
+    fig.update_layout(
+        height=600,
+        geo=dict(
+            bgcolor='rgba(255,255,255,0.1)'
+        )
+    )
+    return fig
+
 class TobaccoDROMCOMDashboard:
     def __init__(self):
         self.historical_data = self.initialize_historical_data()
         self.territorial_data = self.initialize_territorial_data()
+        self.territorial_history = self.initialize_territorial_history()
         self.policy_timeline = self.initialize_policy_timeline()
+        self.policy_store = load_policy_store(POLICY_STORE_PATH, self.policy_timeline)
         self.health_impact_data = self.initialize_health_impact_data()
         self.social_indicators = self.initialize_social_indicators()
+        self.strategies = self.initialize_strategies()
+        self.survey_design = load_survey_design(SURVEY_MICRODATA_PATH, self.territorial_history,
+                                                self.historical_data, self.social_indicators)
         
     def initialize_historical_data(self):
         """Initialise les données historiques du tabagisme dans les DROM-COM"""
@@ -130,6 +271,20 @@ class TobaccoDROMCOMDashboard:
         
         return pd.DataFrame(data)
     
+    def initialize_territorial_history(self):
+        """Initialise l'historique territoire x année x indicateur (format long)"""
+        if TERRITORIAL_HISTORY_PATH:
+            return load_territorial_history(TERRITORIAL_HISTORY_PATH)
+        return territorial_history(self.territorial_data, self.historical_data)
+    
+    def caption_territorial_history(self):
+        """Signale que l'historique affiché est extrapolé faute de données réelles"""
+        if not TERRITORIAL_HISTORY_PATH:
+            st.caption("Historique extrapolé : chaque territoire suit la tendance nationale à partir "
+                       "de sa valeur 2023, les écarts relatifs restent donc constants. Indiquez des "
+                       "données annuelles réelles (territoire, annee, indicateur, valeur) via "
+                       "DASHBOARD_TERRITORIAL_PATH.")
+    
     def initialize_policy_timeline(self):
         """Initialise la timeline des politiques spécifiques aux DROM-COM"""
         return [
@@ -180,6 +335,117 @@ class TobaccoDROMCOMDashboard:
         
         return pd.DataFrame(data)
     
+    def initialize_strategies(self):
+        """Initialise les stratégies de prévention
+        
+        efficacite : score sur 10, calibré comme la baisse relative de prévalence attendue en %
+        (8.9 = -8.9 % de fumeurs) ; acceptabilite : score sur 10 ; cout : unités budgétaires.
+        """
+        strategies = [
+            {'strategie': 'Augmentation des prix', 'efficacite': 8.9, 'cout': 2, 'acceptabilite': 4},
+            {'strategie': 'Paquet neutre', 'efficacite': 7.2, 'cout': 3, 'acceptabilite': 6},
+            {'strategie': 'Interdiction publicité', 'efficacite': 6.8, 'cout': 4, 'acceptabilite': 7},
+            {'strategie': 'Aides au sevrage', 'efficacite': 7.5, 'cout': 6, 'acceptabilite': 8},
+            {'strategie': 'Campagnes média', 'efficacite': 6.1, 'cout': 5, 'acceptabilite': 7},
+            {'strategie': 'Consultations tabacologie', 'efficacite': 8.2, 'cout': 7, 'acceptabilite': 8},
+        ]
+        
+        return pd.DataFrame(strategies)
+    
+    def remember(self, key, factory):
+        """Artefact propre à la session (tableau filtré, figure), évincé au-delà du budget mémoire"""
+        return load_session_guard().remember(current_session_id(), key, factory)
+    
+    def get_survey_estimates(self, value, by=()):
+        """Estimations d'enquête pondérées pour un indicateur et une stratification"""
+        return survey_estimates(self.survey_design, SURVEY_MICRODATA_PATH, value, tuple(by))
+    
+    def add_survey_trace(self, fig, indicator, estimates):
+        """Ajoute l'estimation d'enquête annuelle (points) et son IC 95 % comme série distincte"""
+        name = f'{indicator} ({SURVEY_LABEL})'
+        fig.add_trace(go.Scatter(x=estimates['annee'],
+                                 y=estimates['estimation'],
+                                 mode='markers',
+                                 name=name,
+                                 marker=dict(symbol='diamond', size=7),
+                                 error_y=dict(type='data',
+                                              array=estimates['erreur_haut'],
+                                              arrayminus=estimates['erreur_bas'],
+                                              thickness=1),
+                                 customdata=estimates[['ic_bas', 'ic_haut']],
+                                 hovertemplate='%{x}: %{y:.1f}% [IC 95 %: %{customdata[0]:.1f} - '
+                                               '%{customdata[1]:.1f}]<extra>' + name + '</extra>'))
+    
+    def create_gaps_figure(self, indicateur):
+        """Écarts entre territoires (max - min, écart type) pour un indicateur, année par année"""
+        indicator_df = self.territorial_history[self.territorial_history['indicateur'] == indicateur]
+        gaps = indicator_df.groupby('annee')['valeur'].agg(['min', 'max', 'std']).reset_index()
+        gaps['ecart_max_min'] = gaps['max'] - gaps['min']
+        
+        fig = px.line(gaps, 
+                     x='annee', 
+                     y=['ecart_max_min', 'std'],
+                     title=f'Écarts Territoriaux - {TERRITORIAL_INDICATORS.get(indicateur, indicateur)}',
+                     markers=True)
+        fig.update_layout(yaxis_title="Écart", xaxis_title="Année", height=550)
+        return fig
+    
+    def create_survey_figure(self, survey_year, stratification):
+        """Prévalence estimée par territoire pour une année, avec IC 95 %"""
+        strat_column = {'Ensemble': None, 'Sexe': 'sexe', "Tranche d'âge": 'tranche_age'}[stratification]
+        by = ['annee', 'territoire'] + ([strat_column] if strat_column else [])
+        estimates = self.get_survey_estimates('fumeur', by)
+        estimates = estimates[estimates['annee'] == survey_year]
+        
+        fig = px.bar(estimates, 
+                    x='territoire', 
+                    y='estimation',
+                    color=strat_column,
+                    barmode='group',
+                    error_y='erreur_haut',
+                    error_y_minus='erreur_bas',
+                    hover_data={'effectif': True, 'erreur_type': ':.2f'},
+                    title=f'Prévalence Estimée par Territoire ({SURVEY_LABEL}) - {survey_year}')
+        fig.update_layout(yaxis_title="Prévalence (%)", xaxis_title="Territoire")
+        return fig
+    
+    def create_timeline_figure(self, store, territoire):
+        """Mesures lancées sur 2000-2023, positionnées sur la courbe de prévalence"""
+        prevalence_by_year = self.historical_data.set_index('annee')['prevalence_tabac']
+        policy_df = store.started_between('2000-01-01', '2023-12-31', territoire).copy()
+        policy_df['annee'] = policy_df['date_debut'].dt.year
+        policy_df['prevalence_tabac'] = prevalence_by_year.reindex(policy_df['annee']).to_numpy()
+        
+        fig = px.scatter(policy_df, 
+                       x='annee', 
+                       y='prevalence_tabac',
+                       color='type',
+                       size_max=20,
+                       hover_name='titre',
+                       hover_data={'description': True, 'type': True, 'territoire': True},
+                       title='Impact des Politiques sur la Prévalence du Tabagisme')
+        
+        # Ajouter la ligne de tendance
+        fig.add_trace(go.Scatter(x=self.historical_data['annee'], 
+                               y=self.historical_data['prevalence_tabac'],
+                               mode='lines',
+                               name='Prévalence tabac',
+                               line=dict(color='gray', width=2)))
+        
+        fig.update_layout(showlegend=True)
+        return fig
+    
+    def create_portfolio_figure(self, portfolio_df):
+        """Baisse de prévalence attendue par territoire pour le portefeuille optimal"""
+        return px.bar(portfolio_df.sort_values('reduction_prevalence'), 
+                     x='reduction_prevalence', 
+                     y='territoire',
+                     orientation='h',
+                     hover_data={'strategies': True, 'cout': True},
+                     title='Baisse de Prévalence Attendue (points de %)',
+                     color='reduction_prevalence',
+                     color_continuous_scale='Greens')
+    
     def display_header(self):
         """Affiche l'en-tête du dashboard"""
         st.markdown(
@@ -261,6 +527,9 @@ class TobaccoDROMCOMDashboard:
                              y=['prevalence_tabac', 'fumeurs_quotidiens', 'cigarettes_par_jour'],
                              title='Évolution des Indicateurs de Tabagisme - 2000-2023',
                              markers=True)
+                self.add_survey_trace(fig, 'prevalence_tabac', self.get_survey_estimates('fumeur', ['annee']))
+                self.add_survey_trace(fig, 'fumeurs_quotidiens',
+                                      self.get_survey_estimates('fumeur_quotidien', ['annee']))
                 fig.update_layout(yaxis_title="Pourcentage (%) / Cigarettes", xaxis_title="Année")
                 st.plotly_chart(fig, use_container_width=True)
             
@@ -318,6 +587,10 @@ class TobaccoDROMCOMDashboard:
                              y=['tabagisme_feminin', 'pauvreté_tabac'],
                              title='Tabagisme Féminin et Inégalités Sociales - 2010-2023',
                              markers=True)
+                female = self.get_survey_estimates('fumeur', ['annee', 'sexe'])
+                female = female[(female['sexe'] == 'F') & (female['annee'] >= self.social_indicators['annee'].min())]
+                self.add_survey_trace(fig, 'tabagisme_feminin', female)
+                self.add_survey_trace(fig, 'pauvreté_tabac', self.get_survey_estimates('pauvrete_tabac', ['annee']))
                 fig.update_layout(yaxis_title="Pourcentage (%)", xaxis_title="Année")
                 st.plotly_chart(fig, use_container_width=True)
     
@@ -334,87 +607,66 @@ class TobaccoDROMCOMDashboard:
             
             # Coordonnées approximatives des territoires
             territories_coords = {
-                'Guadeloupe': {'lat': 16.265, 'lon': -61.551, 'prevalence': 28.5},
-                'Martinique': {'lat': 14.641, 'lon': -61.024, 'prevalence': 25.8},
-                'Guyane': {'lat': 3.933, 'lon': -53.125, 'prevalence': 32.4},
-                'La Réunion': {'lat': -21.115, 'lon': 55.536, 'prevalence': 29.1},
-                'Mayotte': {'lat': -12.827, 'lon': 45.166, 'prevalence': 22.6},
-                'Saint-Martin': {'lat': 18.070, 'lon': -63.050, 'prevalence': 35.8},
-                'Saint-Barthélemy': {'lat': 17.900, 'lon': -62.850, 'prevalence': 38.2},
-                'Polynésie française': {'lat': -17.679, 'lon': -149.407, 'prevalence': 26.3},
-                'Nouvelle-Calédonie': {'lat': -21.300, 'lon': 165.300, 'prevalence': 27.9}
+                'Guadeloupe': {'lat': 16.265, 'lon': -61.551},
+                'Martinique': {'lat': 14.641, 'lon': -61.024},
+                'Guyane': {'lat': 3.933, 'lon': -53.125},
+                'La Réunion': {'lat': -21.115, 'lon': 55.536},
+                'Mayotte': {'lat': -12.827, 'lon': 45.166},
+                'Saint-Martin': {'lat': 18.070, 'lon': -63.050},
+                'Saint-Barthélemy': {'lat': 17.900, 'lon': -62.850},
+                'Polynésie française': {'lat': -17.679, 'lon': -149.407},
+                'Nouvelle-Calédonie': {'lat': -21.300, 'lon': 165.300}
             }
             
-            # Créer un DataFrame avec les coordonnées
-            coords_data = []
-            for territory, info in territories_coords.items():
-                coords_data.append({
-                    'territoire': territory,
-                    'lat': info['lat'],
-                    'lon': info['lon'],
-                    'prevalence_tabac': info['prevalence']
-                })
-            
-            coords_df = pd.DataFrame(coords_data)
-            
-            # Créer une carte scatter_geo
-            fig = px.scatter_geo(coords_df,
-                                lat='lat',
-                                lon='lon',
-                                color='prevalence_tabac',
-                                size='prevalence_tabac',
-                                hover_name='territoire',
-                                hover_data={'prevalence_tabac': True},
-                                title='Prévalence du Tabagisme par Territoire (%) - 2023',
-                                color_continuous_scale='RdYlGn_r',
-                                size_max=20,
-                                projection='natural earth')
-            
-            # Configuration de la carte
-            fig.update_geos(
-                visible=True,
-                showcountries=True,
-                countrycolor="black",
-                showsubunits=True,
-                subunitcolor="blue",
-                landcolor="lightgray",
-                oceancolor="lightblue",
-                bgcolor="white"
-            )
+            coords_df = pd.DataFrame.from_dict(territories_coords, orient='index')
+            coords_df = coords_df.rename_axis('territoire').reset_index()
             
-            fig.update_layout(
-                height=600,
-                geo=dict(
-                    bgcolor='rgba(255,255,255,0.1)'
-                )
-            )
+            # Carte animée : toutes les années sont pré-calculées dans une seule figure
+            fig = build_territorial_map_animation(self.territorial_history, coords_df)
             
             st.plotly_chart(fig, use_container_width=True)
+            self.caption_territorial_history()
         
         with tab2:
+            available = self.territorial_history['indicateur'].unique()
+            indicators = [name for name in TERRITORIAL_INDICATORS if name in available] + \
+                sorted(set(available) - set(TERRITORIAL_INDICATORS))
+            indicateur = st.selectbox("Indicateur:", indicators,
+                                      format_func=lambda name: TERRITORIAL_INDICATORS.get(name, name),
+                                      key='comparaison_indicateur')
+            
             col1, col2 = st.columns(2)
             
             with col1:
-                # Classement par prévalence
-                fig = px.bar(self.territorial_data.sort_values('prevalence_2023'), 
-                            x='prevalence_2023', 
-                            y='territoire',
-                            orientation='h',
-                            title='Prévalence du Tabagisme par Territoire (%)',
-                            color='prevalence_2023',
-                            color_continuous_scale='RdYlGn_r')
+                # Classement animé sur toute la période (curseur d'année côté navigateur)
+                fig = build_territorial_bar_animation(self.territorial_history, indicateur)
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
-                # Classement par fumeurs quotidiens
-                fig = px.bar(self.territorial_data.sort_values('fumeurs_quotidiens'), 
-                            x='fumeurs_quotidiens', 
-                            y='territoire',
-                            orientation='h',
-                            title='Fumeurs Quotidiens par Territoire (%)',
-                            color='fumeurs_quotidiens',
-                            color_continuous_scale='RdYlGn_r')
+                # Évolution des écarts entre territoires
+                fig = self.remember(('ecarts', indicateur), lambda: self.create_gaps_figure(indicateur))
                 st.plotly_chart(fig, use_container_width=True)
+            
+            self.caption_territorial_history()
+            
+            # Estimations pondérées de l'enquête, avec intervalles de confiance
+            st.subheader("Estimations d'Enquête Pondérées (IC 95 %)")
+            if not SURVEY_MICRODATA_PATH:
+                st.caption("Enquête simulée, calée chaque année sur les séries nationales : les intervalles "
+                           "illustrent la précision d'une enquête de cette taille. Indiquez de vraies "
+                           "micro-données via DASHBOARD_SURVEY_PATH.")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                survey_year = st.selectbox("Année d'enquête:", list(range(2000, 2024)), index=23,
+                                           key='enquete_annee')
+            with col2:
+                stratification = st.selectbox("Ventilation:", ['Ensemble', 'Sexe', "Tranche d'âge"],
+                                              key='enquete_ventilation')
+            
+            fig = self.remember(('enquete', survey_year, stratification),
+                                lambda: self.create_survey_figure(survey_year, stratification))
+            st.plotly_chart(fig, use_container_width=True)
         
         with tab3:
             # Facteurs contextuels spécifiques
@@ -471,30 +723,14 @@ class TobaccoDROMCOMDashboard:
         
         with tab1:
             # Timeline interactive des politiques
-            policy_df = pd.DataFrame(self.policy_timeline)
-            policy_df['date'] = pd.to_datetime(policy_df['date'])
-            policy_df['annee'] = policy_df['date'].dt.year
-            
-            # Fusion avec données historiques
-            merged_data = pd.merge(self.historical_data, policy_df, on='annee', how='left')
-            
-            fig = px.scatter(merged_data, 
-                           x='annee', 
-                           y='prevalence_tabac',
-                           color='type',
-                           size_max=20,
-                           hover_name='titre',
-                           hover_data={'description': True, 'type': True},
-                           title='Impact des Politiques sur la Prévalence du Tabagisme')
-            
-            # Ajouter la ligne de tendance
-            fig.add_trace(go.Scatter(x=self.historical_data['annee'], 
-                                   y=self.historical_data['prevalence_tabac'],
-                                   mode='lines',
-                                   name='Prévalence tabac',
-                                   line=dict(color='gray', width=2)))
-            
-            fig.update_layout(showlegend=True)
+            store = self.policy_store
+            territory_options = [PolicyEventStore.NATIONAL] + self.territorial_data['territoire'].tolist()
+            timeline_territory = st.selectbox("Territoire de la timeline:", territory_options,
+                                              key='timeline_territoire')
+            
+            # Mesures lancées sur la période, positionnées sur la courbe de prévalence
+            fig = self.remember(('timeline', timeline_territory, store.version),
+                                lambda: self.create_timeline_figure(store, timeline_territory))
             st.plotly_chart(fig, use_container_width=True)
             
             # Légende des types de politiques
@@ -505,21 +741,44 @@ class TobaccoDROMCOMDashboard:
                 st.markdown('<div class="policy-card policy-regulation">Régulation</div>', unsafe_allow_html=True)
             with col3:
                 st.markdown('<div class="policy-card policy-treatment">Prise en charge</div>', unsafe_allow_html=True)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Mesures en vigueur pour le territoire et l'année choisis
+                active_year = st.slider("Mesures en vigueur en:", 2000, 2023, 2023, key='timeline_annee')
+                active_df = self.remember(('mesures_actives', timeline_territory, active_year, store.version),
+                                          lambda: store.active_in(timeline_territory, active_year))
+                st.markdown(f"**{len(active_df)} mesure(s) en vigueur en {active_year}**")
+                st.dataframe(active_df[['date_debut', 'territoire', 'type', 'titre']],
+                             use_container_width=True, hide_index=True)
+            
+            with col2:
+                # Changements précédant un point d'inflexion
+                inflection_year = st.selectbox("Point d'inflexion:", list(range(2000, 2024)),
+                                               index=20, key='timeline_inflexion')
+                months = st.number_input("Fenêtre (mois avant):", min_value=1, max_value=120,
+                                         value=24, key='timeline_mois')
+                changes_df = self.remember(
+                    ('changements', timeline_territory, inflection_year, months, store.version),
+                    lambda: store.changes_before(f'{inflection_year}-01-01', months, timeline_territory))
+                st.markdown(f"**{len(changes_df)} changement(s) dans les {months} mois précédents**")
+                st.dataframe(changes_df[['date_changement', 'changement', 'territoire', 'titre']],
+                             use_container_width=True, hide_index=True)
+            
+            # Import en masse, réservé aux administrateurs : il modifie les données de toutes les sessions
+            admin_token = os.environ.get('DASHBOARD_ADMIN_TOKEN', '')
+            if admin_token:
+                with st.expander("Importer des mesures (administration)"):
+                    token = st.text_input("Jeton d'administration", type='password', key='timeline_token')
+                    if hmac.compare_digest(token.encode(), admin_token.encode()):
+                        self.import_policy_file(store)
         
         with tab2:
             # Efficacité comparée des stratégies
             st.subheader("Efficacité des Stratégies de Prévention")
             
-            strategies = [
-                {'strategie': 'Augmentation des prix', 'efficacite': 8.9, 'cout': 2, 'acceptabilite': 4},
-                {'strategie': 'Paquet neutre', 'efficacite': 7.2, 'cout': 3, 'acceptabilite': 6},
-                {'strategie': 'Interdiction publicité', 'efficacite': 6.8, 'cout': 4, 'acceptabilite': 7},
-                {'strategie': 'Aides au sevrage', 'efficacite': 7.5, 'cout': 6, 'acceptabilite': 8},
-                {'strategie': 'Campagnes média', 'efficacite': 6.1, 'cout': 5, 'acceptabilite': 7},
-                {'strategie': 'Consultations tabacologie', 'efficacite': 8.2, 'cout': 7, 'acceptabilite': 8},
-            ]
-            
-            strategy_df = pd.DataFrame(strategies)
+            strategy_df = self.strategies
             
             fig = px.scatter(strategy_df, 
                            x='cout', 
@@ -530,6 +789,54 @@ class TobaccoDROMCOMDashboard:
                            title='Efficacité vs Coût des Stratégies',
                            size_max=30)
             st.plotly_chart(fig, use_container_width=True)
+            
+            # Optimiseur de portefeuille de stratégies
+            st.subheader("Simulation : Portefeuille Optimal de Stratégies")
+            st.caption("Hypothèse de calcul : le score d'efficacité (sur 10) est traité comme la baisse "
+                       "relative de prévalence attendue en % (efficacité 8.9 = -8.9 % de fumeurs) ; "
+                       "les effets de plusieurs stratégies se combinent de manière multiplicative.")
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                budget = st.slider("Budget par territoire (unités)", 0, int(strategy_df['cout'].sum()), 12,
+                                   key='portfolio_budget')
+            with col2:
+                min_acceptabilite = st.slider("Acceptabilité minimale", 0, 10, 5, key='portfolio_acceptabilite')
+            with col3:
+                max_strategies = st.slider("Nombre max. de stratégies", 1, len(strategy_df), 3,
+                                           key='portfolio_max_strategies')
+            
+            with st.expander("Plafonds budgétaires par territoire"):
+                caps_df = st.data_editor(
+                    pd.DataFrame({'territoire': self.territorial_data['territoire'], 'plafond': float(budget)}),
+                    disabled=['territoire'], hide_index=True, use_container_width=True,
+                    key='portfolio_plafonds'
+                )
+            territory_caps = dict(zip(caps_df['territoire'], caps_df['plafond']))
+            
+            portfolio_df = optimize_strategy_portfolio(strategy_df, self.territorial_data, budget,
+                                                       min_acceptabilite, max_strategies, territory_caps)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fig = self.remember(('portefeuille', budget, min_acceptabilite, max_strategies,
+                                     tuple(territory_caps.items())),
+                                    lambda: self.create_portfolio_figure(portfolio_df))
+                st.plotly_chart(fig, use_container_width=True)
+            
+            with col2:
+                portfolio_territory = st.selectbox("Détail pour le territoire:", portfolio_df['territoire'],
+                                                   key='portfolio_territoire')
+                selection = portfolio_df[portfolio_df['territoire'] == portfolio_territory].iloc[0]
+                st.metric("Prévalence projetée",
+                          f"{selection['prevalence_projetee']:.1f}%",
+                          f"{-selection['reduction_prevalence']:.1f} pts",
+                          delta_color="inverse")
+                st.write(f"**Stratégies retenues:** {selection['strategies'] or 'Aucune'}")
+                st.write(f"**Coût:** {selection['cout']:.0f} unités")
+            
+            st.dataframe(portfolio_df, use_container_width=True, hide_index=True)
         
         with tab3:
             st.subheader("Recommandations par Territoire")
@@ -552,6 +859,23 @@ class TobaccoDROMCOMDashboard:
             for i, recommendation in enumerate(recommendations[selected_territory], 1):
                 st.write(f"{i}. {recommendation}")
     
+    def import_policy_file(self, store):
+        """Import en masse de mesures locales ou nationales (CSV ou JSON)"""
+        uploaded = st.file_uploader("Fichier de mesures (CSV ou JSON)", type=['csv', 'json'],
+                                    key='timeline_import')
+        if uploaded is None or st.session_state.get('timeline_import_id') == uploaded.file_id:
+            return
+        try:
+            if uploaded.name.endswith('.csv'):
+                imported = store.import_csv(uploaded)
+            else:
+                imported = store.import_json(uploaded)
+        except (ValueError, KeyError, pd.errors.ParserError) as error:
+            st.error(f"Import impossible : {error}")
+            return
+        st.session_state['timeline_import_id'] = uploaded.file_id
+        st.success(f"{imported} mesure(s) importée(s)")
+    
     def create_strategic_recommendations(self):
         """Recommandations stratégiques"""
         st.markdown('<h3 class="section-header">🎯 STRATÉGIE NATIONALE TABAC DROM-COM</h3>', 
@@ -711,6 +1035,12 @@ class TobaccoDROMCOMDashboard:
     
     def run_dashboard(self):
         """Exécute le dashboard complet"""
+        # Regroupement des reruns en rafale (changements de widgets rapprochés)
+        guard = load_session_guard()
+        session_id = current_session_id()
+        if guard.begin_rerun(session_id):
+            guard.wait()
+        
         # Sidebar
         controls = self.create_sidebar()
         
@@ -800,6 +1130,8 @@ class TobaccoDROMCOMDashboard:
             **Échéance: Plan d'action opérationnel pour 2024**
             """)
         
+        guard.end_rerun(session_id, st.session_state)
+        
         # Rafraîchissement automatique
         if controls['auto_refresh']:
             time.sleep(300)
@@ -807,5 +1139,6 @@ class TobaccoDROMCOMDashboard:
 
 # Lancement du dashboard
 if __name__ == "__main__":
-    dashboard = TobaccoDROMCOMDashboard()
-    dashboard.run_dashboard()
\ No newline at end of file
+    # Instance conservée par session, évincée au-delà du budget mémoire
+    dashboard = load_session_guard().remember(current_session_id(), 'dashboard', TobaccoDROMCOMDashboard)
+    dashboard.run_dashboard()
@@ -0,0 +1 @@
+# Racine du dépôt : rend les modules du dashboard importables depuis tests/
@@ -0,0 +1,154 @@
+"""Référentiel des mesures de politique tabac, indexé par intervalles de dates."""
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Instantané immuable des mesures et de leurs tableaux de recherche
+PolicyIndex = namedtuple('PolicyIndex', ['events', 'columns', 'starts', 'ends', 'territories',
+                                         'end_order', 'ends_sorted'])
+
+
+class PolicyEventStore:
+    """Stocke les mesures de politique tabac (début, fin, territoire) avec un index d'intervalles"""
+    
+    COLUMNS = ['date_debut', 'date_fin', 'territoire', 'type', 'titre', 'description']
+    NATIONAL = 'Tous'
+    OPEN_END = pd.Timestamp('2100-12-31')  # mesures toujours en vigueur
+    
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = self._build_index(pd.DataFrame(columns=self.COLUMNS))
+        self.version = 0  # incrémentée à chaque modification (clé des résultats mis en cache)
+        if path and os.path.exists(path):
+            self.import_json(path, persist=False)
+    
+    def __len__(self):
+        return len(self._index.events)
+    
+    @property
+    def events(self):
+        return self._index.events
+    
+    def _normalize(self, records):
+        """Harmonise les colonnes et les dates des mesures importées"""
+        df = pd.DataFrame(records)
+        if 'date_debut' not in df.columns:
+            df = df.rename(columns={'date': 'date_debut'})
+        for column in self.COLUMNS:
+            if column not in df.columns:
+                df[column] = None
+        df = df[self.COLUMNS].copy()
+        df['date_debut'] = pd.to_datetime(df['date_debut'])
+        df['date_fin'] = pd.to_datetime(df['date_fin']).fillna(self.OPEN_END)
+        df['territoire'] = df['territoire'].fillna(self.NATIONAL)
+        df['description'] = df['description'].fillna('')
+        return df.dropna(subset=['date_debut', 'titre'])
+    
+    def _build_index(self, events):
+        """Trie les mesures par date de début et construit les tableaux de recherche"""
+        events = events.sort_values('date_debut', kind='stable').reset_index(drop=True)
+        ends = events['date_fin'].to_numpy(dtype='datetime64[ns]')
+        end_order = np.argsort(ends, kind='stable')
+        return PolicyIndex(events=events,
+                           columns={column: events[column].to_numpy() for column in self.COLUMNS},
+                           starts=events['date_debut'].to_numpy(dtype='datetime64[ns]'),
+                           ends=ends,
+                           territories=events['territoire'].to_numpy(dtype=object),
+                           end_order=end_order,
+                           ends_sorted=ends[end_order])
+    
+    def _territory_mask(self, territories, territoire):
+        """Mesures propres au territoire ou nationales (None = tous les territoires)"""
+        if territoire is None or territoire == self.NATIONAL:
+            return np.ones(len(territories), dtype=bool)
+        return (territories == territoire) | (territories == self.NATIONAL)
+    
+    def add_events(self, records, persist=True):
+        """Ajoute des mesures (liste de dicts ou DataFrame) et met à jour l'index"""
+        new_events = self._normalize(records)
+        with self._lock:
+            frames = [df for df in (self._index.events, new_events) if not df.empty]
+            events = pd.DataFrame(columns=self.COLUMNS)
+            if frames:
+                events = pd.concat(frames, ignore_index=True).drop_duplicates(
+                    subset=['date_debut', 'territoire', 'titre'], keep='last')
+            # Remplacement en une seule affectation : les lecteurs voient l'ancien ou le nouvel index
+            self._index = self._build_index(events)
+            self.version += 1
+            if persist:
+                self.save()
+        return len(new_events)
+    
+    def import_csv(self, source, persist=True):
+        """Import en masse depuis un fichier CSV"""
+        return self.add_events(pd.read_csv(source), persist=persist)
+    
+    def import_json(self, source, persist=True):
+        """Import en masse depuis un fichier JSON (liste d'objets)"""
+        return self.add_events(pd.read_json(source, orient='records', convert_dates=False), persist=persist)
+    
+    def save(self, path=None):
+        """Enregistre les mesures au format JSON"""
+        path = path or self.path
+        if not path:
+            return
+        events = self._index.events
+        export = events.copy()
+        export['date_debut'] = export['date_debut'].dt.strftime('%Y-%m-%d')
+        export['date_fin'] = export['date_fin'].dt.strftime('%Y-%m-%d').where(
+            events['date_fin'] != self.OPEN_END)
+        export.to_json(path, orient='records', force_ascii=False, indent=1)
+    
+    def active_between(self, debut, fin, territoire=None):
+        """Mesures en vigueur sur au moins une partie de la période [debut, fin]"""
+        index = self._index
+        debut, fin = np.datetime64(pd.Timestamp(debut), 'ns'), np.datetime64(pd.Timestamp(fin), 'ns')
+        # Seules les mesures ayant débuté avant la fin de la période sont candidates
+        candidates = np.searchsorted(index.starts, fin, side='right')
+        mask = (index.ends[:candidates] >= debut) & \
+            self._territory_mask(index.territories[:candidates], territoire)
+        return index.events.iloc[:candidates][mask]
+    
+    def active_in(self, territoire, annee):
+        """Mesures en vigueur dans un territoire pour une année donnée"""
+        return self.active_between(f'{annee}-01-01', f'{annee}-12-31', territoire)
+    
+    def _started_positions(self, index, debut, fin, territoire):
+        lo = np.searchsorted(index.starts, debut, side='left')
+        hi = np.searchsorted(index.starts, fin, side='right')
+        positions = np.arange(lo, hi)
+        return positions[self._territory_mask(index.territories[lo:hi], territoire)]
+    
+    def started_between(self, debut, fin, territoire=None):
+        """Mesures ayant débuté dans la période [debut, fin]"""
+        index = self._index
+        positions = self._started_positions(index, np.datetime64(pd.Timestamp(debut), 'ns'),
+                                            np.datetime64(pd.Timestamp(fin), 'ns'), territoire)
+        return index.events.iloc[positions]
+    
+    def changes_before(self, date, months, territoire=None):
+        """Mesures ayant débuté ou pris fin dans les N mois précédant une date"""
+        index = self._index
+        fin = pd.Timestamp(date)
+        debut = np.datetime64(fin - pd.DateOffset(months=months), 'ns')
+        fin = np.datetime64(fin, 'ns')
+        
+        started = self._started_positions(index, debut, fin, territoire)
+        lo = np.searchsorted(index.ends_sorted, debut, side='left')
+        hi = np.searchsorted(index.ends_sorted, fin, side='right')
+        ended = index.end_order[lo:hi]
+        ended = ended[self._territory_mask(index.territories[ended], territoire)]
+        
+        positions = np.concatenate([started, ended])
+        change_dates = np.concatenate([index.starts[started], index.ends[ended]])
+        order = np.argsort(change_dates, kind='stable')
+        # Construction en une fois à partir des colonnes pré-extraites (plus rapide que iloc + ajouts)
+        selection = positions[order]
+        changes = {column: values[selection] for column, values in index.columns.items()}
+        changes['changement'] = np.where(order < len(started), 'début', 'fin')
+        changes['date_changement'] = change_dates[order]
+        return pd.DataFrame(changes)
@@ -0,0 +1,287 @@
+"""Limitation des reruns, budget mémoire par session et métriques Prometheus du dashboard.
+
+Streamlit n'offre pas de point d'accroche côté serveur pour regrouper les
+reruns : une session qui enchaîne les changements de widgets est donc
+temporisée au début du script. Avec ``runner.fastReruns`` activé, tout nouvel
+événement survenu pendant cette pause interrompt le rerun en attente, si bien
+que seule la dernière modification déclenche un rendu complet.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Bornes (secondes) de l'histogramme des durées de rerun
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def current_session_id():
+    """Identifiant de la session Streamlit courante ('local' hors serveur)"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'local'
+
+
+def estimate_size(value, excluded=frozenset()):
+    """Estimation de l'empreinte mémoire d'un objet stocké en session (octets)
+
+    Les objets dont l'identifiant figure dans ``excluded`` (ressources partagées
+    entre sessions) ne sont pas comptés : évincer la session ne les libérerait pas.
+    """
+    if id(value) in excluded:
+        return 0
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, 'to_plotly_json'):
+        return sys.getsizeof(value.to_json())  # figure Plotly : taille de sa sérialisation
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v, excluded) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(v, excluded) for v in value)
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        return sys.getsizeof(value) + estimate_size(vars(value), excluded)
+    return sys.getsizeof(value)
+
+
+class SessionState:
+    """Suivi d'une session : reruns récents, artefacts mis en cache et mémoire"""
+
+    def __init__(self):
+        self.rerun_times = deque()
+        self.running = False
+        self.started_at = 0.0
+        self.last_seen = time.monotonic()
+        self.artifacts = OrderedDict()  # clé -> (valeur, taille), ordre LRU
+        self.state_bytes = 0  # st.session_state, mesuré à la fin de chaque rerun complet
+
+    @property
+    def artifacts_bytes(self):
+        return sum(size for _, size in self.artifacts.values())
+
+    @property
+    def memory_bytes(self):
+        return self.state_bytes + self.artifacts_bytes
+
+
+class SessionGuard:
+    """Régulation des reruns et budget mémoire partagés par toutes les sessions"""
+
+    def __init__(self, max_reruns=4, window=2.0, debounce=0.4,
+                 session_budget=64 * 2**20, global_budget=512 * 2**20, session_ttl=1800):
+        self.max_reruns = max_reruns
+        self.window = window
+        self.debounce = debounce
+        self.session_budget = session_budget
+        self.global_budget = global_budget
+        self.session_ttl = session_ttl
+
+        self.sessions = {}
+        self.rerun_times = deque()
+        self.reruns_total = 0
+        self.reruns_coalesced = 0
+        self.reruns_throttled = 0
+        self.queued = 0
+        self.evictions = 0
+        self.duration_counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+        self.shared_ids = set()
+        self._lock = threading.Lock()
+        self.server = None
+
+    def share(self, resource):
+        """Déclare une ressource partagée entre sessions, exclue des budgets par session"""
+        with self._lock:
+            self.shared_ids.add(id(resource))
+        return resource
+
+    def _session(self, session_id):
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = SessionState()
+        return state
+
+    def _expire_sessions(self, now):
+        """Oublie les sessions inactives depuis plus de session_ttl secondes
+
+        Un rerun interrompu (nouvel événement, onglet fermé, exception) n'atteint jamais
+        end_rerun : seule la date de dernière activité compte, pas l'indicateur running.
+        """
+        expired = [sid for sid, state in self.sessions.items()
+                   if now - state.last_seen > self.session_ttl]
+        for sid in expired:
+            del self.sessions[sid]
+
+    def begin_rerun(self, session_id):
+        """Enregistre le début d'un rerun ; renvoie True si la session doit être temporisée"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire_sessions(now)
+            state = self._session(session_id)
+            if state.running:
+                # Le rerun précédent a été interrompu par celui-ci
+                self.reruns_coalesced += 1
+            state.running = True
+            state.started_at = now
+            state.last_seen = now
+
+            state.rerun_times.append(now)
+            while state.rerun_times and now - state.rerun_times[0] > self.window:
+                state.rerun_times.popleft()
+            self.rerun_times.append(now)
+            while self.rerun_times and now - self.rerun_times[0] > 60:
+                self.rerun_times.popleft()
+            self.reruns_total += 1
+
+            throttled = len(state.rerun_times) > self.max_reruns
+            if throttled:
+                self.reruns_throttled += 1
+            return throttled
+
+    def wait(self):
+        """Pause de regroupement : un nouvel événement pendant l'attente remplace ce rerun"""
+        with self._lock:
+            self.queued += 1
+        try:
+            time.sleep(self.debounce)
+        finally:
+            with self._lock:
+                self.queued -= 1
+
+    def end_rerun(self, session_id, session_state=None):
+        """Enregistre la fin d'un rerun complet, mesure st.session_state et applique les budgets"""
+        now = time.monotonic()
+        user_bytes = 0
+        if session_state is not None:
+            user_bytes = sum(estimate_size(value, self.shared_ids) for value in session_state.values())
+        with self._lock:
+            state = self._session(session_id)
+            duration = now - state.started_at
+            state.running = False
+            state.last_seen = now
+            if session_state is not None:
+                state.state_bytes = user_bytes
+                # Un st.session_state qui grossit réduit d'autant la place laissée aux artefacts
+                self._enforce_budgets(state)
+
+            self.duration_sum += duration
+            bucket = next((i for i, bound in enumerate(DURATION_BUCKETS) if duration <= bound),
+                          len(DURATION_BUCKETS))
+            self.duration_counts[bucket] += 1
+
+    def remember(self, session_id, key, factory):
+        """Artefact mis en cache pour la session, évincé (LRU) au-delà des budgets mémoire"""
+        with self._lock:
+            state = self._session(session_id)
+            if key in state.artifacts:
+                state.artifacts.move_to_end(key)
+                return state.artifacts[key][0]
+
+        value = factory()
+        size = estimate_size(value, self.shared_ids)
+        with self._lock:
+            state.artifacts[key] = (value, size)
+            self._enforce_budgets(state)
+        return value
+
+    def _enforce_budgets(self, current):
+        """Évince les artefacts les plus anciens, d'abord dans la session puis globalement
+
+        Les budgets portent sur st.session_state et les artefacts ; seuls ces derniers
+        sont évincés, l'artefact le plus récent de la session courante étant conservé.
+        """
+        while len(current.artifacts) > 1 and current.memory_bytes > self.session_budget:
+            current.artifacts.popitem(last=False)
+            self.evictions += 1
+
+        # Budget global : on libère en priorité les sessions les plus gourmandes
+        total = sum(state.memory_bytes for state in self.sessions.values())
+        while total > self.global_budget:
+            state = max(self.sessions.values(), key=lambda s: s.artifacts_bytes)
+            if not state.artifacts or (state is current and len(state.artifacts) == 1):
+                break
+            _, size = state.artifacts.popitem(last=False)[1]
+            total -= size
+            self.evictions += 1
+
+    def render_metrics(self):
+        """Métriques au format texte Prometheus"""
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(1 for t in self.rerun_times if now - t <= 60)
+            lines = [
+                '# HELP dashboard_reruns_total Reruns du script démarrés.',
+                '# TYPE dashboard_reruns_total counter',
+                f'dashboard_reruns_total {self.reruns_total}',
+                '# HELP dashboard_reruns_per_second Reruns par seconde (moyenne sur 60 s).',
+                '# TYPE dashboard_reruns_per_second gauge',
+                f'dashboard_reruns_per_second {recent / 60:.4f}',
+                '# HELP dashboard_reruns_coalesced_total Reruns interrompus et remplacés par un plus récent.',
+                '# TYPE dashboard_reruns_coalesced_total counter',
+                f'dashboard_reruns_coalesced_total {self.reruns_coalesced}',
+                '# HELP dashboard_reruns_throttled_total Reruns temporisés pour cause de rafale.',
+                '# TYPE dashboard_reruns_throttled_total counter',
+                f'dashboard_reruns_throttled_total {self.reruns_throttled}',
+                '# HELP dashboard_reruns_queued Reruns en attente de regroupement.',
+                '# TYPE dashboard_reruns_queued gauge',
+                f'dashboard_reruns_queued {self.queued}',
+                '# HELP dashboard_sessions_active Sessions suivies.',
+                '# TYPE dashboard_sessions_active gauge',
+                f'dashboard_sessions_active {len(self.sessions)}',
+                '# HELP dashboard_artifact_evictions_total Artefacts de session évincés.',
+                '# TYPE dashboard_artifact_evictions_total counter',
+                f'dashboard_artifact_evictions_total {self.evictions}',
+                '# HELP dashboard_session_memory_bytes Mémoire estimée par session.',
+                '# TYPE dashboard_session_memory_bytes gauge',
+            ]
+            for sid, state in self.sessions.items():
+                lines.append(f'dashboard_session_memory_bytes{{session="{sid}"}} {state.memory_bytes}')
+            total = sum(state.memory_bytes for state in self.sessions.values())
+            lines += [
+                '# HELP dashboard_memory_bytes Mémoire estimée de toutes les sessions.',
+                '# TYPE dashboard_memory_bytes gauge',
+                f'dashboard_memory_bytes {total}',
+                '# HELP dashboard_rerun_duration_seconds Durée des reruns complets.',
+                '# TYPE dashboard_rerun_duration_seconds histogram',
+            ]
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, self.duration_counts):
+                cumulative += count
+                lines.append(f'dashboard_rerun_duration_seconds_bucket{{le="{bound}"}} {cumulative}')
+            cumulative += self.duration_counts[-1]
+            lines += [
+                f'dashboard_rerun_duration_seconds_bucket{{le="+Inf"}} {cumulative}',
+                f'dashboard_rerun_duration_seconds_sum {self.duration_sum:.4f}',
+                f'dashboard_rerun_duration_seconds_count {cumulative}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def start_metrics_server(self, port, host='127.0.0.1'):
+        """Expose /metrics en local dans un thread dédié (port 0 : désactivé)"""
+        if not port or self.server is not None:
+            return self.server
+        guard = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') != '/metrics':
+                    self.send_error(404)
+                    return
+                body = guard.render_metrics().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError:
+            return None  # port déjà utilisé (autre processus du dashboard)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
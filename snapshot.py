@@ -0,0 +1,219 @@
+"""Génère une version statique (HTML, JSON, assets) de la vue par défaut du dashboard.
+
+Usage:
+    python snapshot.py [--output public] [--force]
+
+Le bundle n'est régénéré que si la version des données a changé ; il peut
+ensuite être servi par n'importe quel serveur de fichiers statiques.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+
+import plotly
+from streamlit.testing.v1 import AppTest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DASHBOARD_PATH = os.path.join(BASE_DIR, 'Dashboard.py')
+
+# Fichiers dont dépend le contenu de la vue par défaut (code importé compris)
+DATA_FILES = [
+    DASHBOARD_PATH,
+    os.path.join(BASE_DIR, 'survey_estimation.py'),
+    os.path.join(BASE_DIR, 'policy_store.py'),
+    os.path.join(BASE_DIR, 'session_guard.py'),
+    os.path.join(BASE_DIR, 'strategy_optimizer.py'),
+    os.path.join(BASE_DIR, 'territorial_data.py'),
+    os.path.join(BASE_DIR, 'policy_events.json'),
+    os.environ.get('DASHBOARD_SURVEY_PATH', ''),
+    os.environ.get('DASHBOARD_TERRITORIAL_PATH', ''),
+]
+
+HASH_BLOCK_SIZE = 2**20  # 1 Mio
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Dashboard Tabagisme DROM-COM - Analyse Stratégique</title>
+<script src="assets/plotly.min.js"></script>
+<style>
+    body {{ font-family: sans-serif; max-width: 1400px; margin: 0 auto; padding: 1rem 2rem; }}
+    .row {{ display: flex; gap: 1.5rem; }}
+    .row > .column {{ flex: 1; min-width: 0; }}
+    .tab {{ margin-top: 1.5rem; }}
+    .tab > h2, .tab > h3 {{ color: #2E8B57; }}
+    .metric {{ padding: 0.5rem 0; }}
+    .metric .label {{ font-size: 0.9rem; }}
+    .metric .value {{ font-size: 2rem; }}
+    .metric .delta {{ font-size: 0.9rem; color: #555; }}
+    .snapshot-info {{ font-size: 0.8rem; color: #777; text-align: right; }}
+    table {{ border-collapse: collapse; font-size: 0.85rem; }}
+    td, th {{ border: 1px solid #ddd; padding: 0.25rem 0.5rem; }}
+</style>
+</head>
+<body>
+<p class="snapshot-info">Vue statique générée le {generated_at} (données {version})</p>
+{body}
+<script>
+    const figures = {figures};
+    for (const [id, figure] of Object.entries(figures)) {{
+        Plotly.newPlot(id, {{
+            data: figure.data,
+            layout: figure.layout,
+            frames: figure.frames || [],
+            config: {{responsive: true, displaylogo: false}}
+        }});
+    }}
+</script>
+</body>
+</html>
+"""
+
+
+def data_version(paths=DATA_FILES):
+    """Empreinte des fichiers de données, du code du dashboard et de la version de Plotly"""
+    digest = hashlib.sha256(plotly.__version__.encode())
+    for path in paths:
+        if os.path.exists(path):
+            # Lecture par blocs : les micro-données peuvent peser plusieurs Go
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def markdown_to_html(text):
+    """Conversion minimale du Markdown utilisé dans le dashboard (titres, gras, listes)"""
+    if text.lstrip().startswith('<'):
+        return text  # blocs HTML déjà mis en forme
+    lines = []
+    for line in text.strip().splitlines():
+        line = html.escape(line.strip())
+        line = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', line)
+        heading = re.match(r'(#{1,6})\s+(.*)', line)
+        if heading:
+            level = len(heading.group(1))
+            lines.append(f'<h{level}>{heading.group(2)}</h{level}>')
+        elif line:
+            lines.append(f'{line}<br>')
+    return '\n'.join(lines)
+
+
+class SnapshotRenderer:
+    """Parcourt l'arbre d'éléments Streamlit et le convertit en HTML statique"""
+
+    def __init__(self):
+        self.figures = {}
+        self.kpis = []
+        self.tab_depth = 0
+
+    def render(self, node):
+        node_type = getattr(node, 'type', None)
+        if node_type == 'markdown':
+            return markdown_to_html(node.value)
+        if node_type == 'subheader':
+            return f'<h4>{html.escape(node.value)}</h4>'
+        if node_type == 'metric':
+            self.kpis.append({'label': node.label, 'value': node.value, 'delta': node.delta})
+            return ('<div class="metric">'
+                    f'<div class="label">{html.escape(node.label)}</div>'
+                    f'<div class="value">{html.escape(node.value)}</div>'
+                    f'<div class="delta">{html.escape(node.delta or "")}</div></div>')
+        if node_type == 'plotly_chart':
+            figure_id = f'figure-{len(self.figures)}'
+            self.figures[figure_id] = json.loads(node.proto.spec)
+            return f'<div id="{figure_id}"></div>'
+        if node_type == 'dataframe':
+            if node.proto.editing_mode:
+                return ''  # tableaux éditables réservés à l'application interactive
+            return node.value.to_html(index=False, border=0)
+        if not hasattr(node, 'children'):
+            return ''  # widgets interactifs ignorés dans la vue statique
+
+        if node_type == 'tab':
+            self.tab_depth += 1
+        inner = '\n'.join(filter(None, (self.render(child) for child in node.children.values())))
+        if node_type == 'tab':
+            self.tab_depth -= 1
+            level = 2 if self.tab_depth == 0 else 3
+            return (f'<section class="tab"><h{level}>{html.escape(node.label)}</h{level}>\n'
+                    f'{inner}\n</section>')
+        if node_type == 'flex_container' and all(
+                getattr(child, 'type', None) == 'column' for child in node.children.values()):
+            return f'<div class="row">\n{inner}\n</div>'
+        if node_type == 'column':
+            return f'<div class="column">\n{inner}\n</div>'
+        if node_type == 'expander':
+            label = html.escape(getattr(node, 'label', '') or '')
+            return f'<details><summary>{label}</summary>\n{inner}\n</details>' if inner else ''
+        return inner
+
+
+def _write(path, content):
+    """Écriture atomique pour ne jamais servir un fichier à moitié écrit"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def generate_snapshot(output_dir, force=False):
+    """Rend la vue par défaut et écrit le bundle statique ; renvoie False s'il est déjà à jour"""
+    version = data_version()
+    manifest_path = os.path.join(output_dir, 'snapshot.json')
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            if json.load(f).get('version') == version:
+                return False
+
+    app = AppTest.from_file(DASHBOARD_PATH, default_timeout=120).run()
+    if app.exception:
+        raise RuntimeError(f"Échec du rendu du dashboard: {app.exception[0].value}")
+
+    renderer = SnapshotRenderer()
+    body = renderer.render(app.main)
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    os.makedirs(os.path.join(output_dir, 'assets'), exist_ok=True)
+    shutil.copyfile(os.path.join(os.path.dirname(plotly.__file__), 'package_data', 'plotly.min.js'),
+                    os.path.join(output_dir, 'assets', 'plotly.min.js'))
+
+    figures_json = json.dumps(renderer.figures, ensure_ascii=False).replace('</', '<\\/')
+    _write(os.path.join(output_dir, 'index.html'),
+           PAGE_TEMPLATE.format(generated_at=generated_at, version=version,
+                                body=body, figures=figures_json))
+
+    # Le manifeste est écrit en dernier : sa version n'est à jour qu'une fois le bundle complet
+    manifest = {
+        'version': version,
+        'generated_at': generated_at,
+        'kpis': renderer.kpis,
+        'figures': renderer.figures,
+    }
+    _write(manifest_path, json.dumps(manifest, ensure_ascii=False))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère la version statique du dashboard")
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'public'),
+                        help="Répertoire de sortie du bundle")
+    parser.add_argument('--force', action='store_true',
+                        help="Régénère même si la version des données est inchangée")
+    args = parser.parse_args()
+
+    if generate_snapshot(args.output, force=args.force):
+        print(f"Snapshot généré dans {args.output}")
+    else:
+        print(f"Snapshot déjà à jour ({data_version()})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Optimisation du portefeuille de stratégies anti-tabac par territoire."""
+import numpy as np
+import pandas as pd
+
+# Nombre maximal de stratégies énumérées (2^20 combinaisons, quelques dizaines de Mo)
+MAX_STRATEGIES = 20
+
+
+def optimize_portfolio(strategy_df, territorial_df, budget, min_acceptabilite,
+                       max_strategies, territory_caps=None):
+    """Choisit pour chaque territoire la combinaison de stratégies maximisant la baisse de prévalence
+
+    Le score d'efficacité (sur 10) est lu comme une baisse relative de prévalence en % :
+    une stratégie d'efficacité 8.9 réduit la prévalence du territoire de 8.9 %.
+    L'énumération est exacte mais en 2^n : au-delà de MAX_STRATEGIES stratégies,
+    une ValueError est levée.
+    """
+    n = len(strategy_df)
+    if n > MAX_STRATEGIES:
+        raise ValueError(f"{n} stratégies : l'énumération exacte est limitée à {MAX_STRATEGIES}")
+    # Toutes les combinaisons possibles (2^n lignes) : énumération exacte du sac à dos
+    combos = ((np.arange(2 ** n)[:, None] >> np.arange(n)) & 1).astype(bool)
+    costs = combos @ strategy_df['cout'].to_numpy(dtype=float)
+
+    # Effets combinés de manière multiplicative : 1 - Π(1 - efficacité/100)
+    log_remaining = combos @ np.log1p(-strategy_df['efficacite'].to_numpy(dtype=float) / 100)
+    reduction_rate = -np.expm1(log_remaining)
+
+    # Contraintes communes : acceptabilité minimale et nombre de stratégies
+    rejected = strategy_df['acceptabilite'].to_numpy() < min_acceptabilite
+    allowed = ~combos[:, rejected].any(axis=1) & (combos.sum(axis=1) <= max_strategies)
+
+    # Contraintes par territoire : plafond budgétaire propre (territoires x combinaisons)
+    caps = territorial_df['territoire'].map(territory_caps or {}).fillna(budget).clip(upper=budget)
+    feasible = allowed[None, :] & (costs[None, :] <= caps.to_numpy(dtype=float)[:, None])
+    reductions = territorial_df['prevalence_2023'].to_numpy(dtype=float)[:, None] * reduction_rate[None, :]
+
+    # À réduction égale, la combinaison la moins coûteuse l'emporte
+    scores = np.where(feasible, reductions - costs[None, :] * 1e-9, -np.inf)
+    best = scores.argmax(axis=1)
+
+    names = strategy_df['strategie'].to_numpy()
+    chosen = combos[best]
+    best_reduction = reductions[np.arange(len(best)), best]
+    return pd.DataFrame({
+        'territoire': territorial_df['territoire'].to_numpy(),
+        'strategies': [', '.join(names[row]) for row in chosen],
+        'nb_strategies': chosen.sum(axis=1),
+        'cout': costs[best],
+        'reduction_prevalence': best_reduction.round(2),
+        'prevalence_projetee': (territorial_df['prevalence_2023'].to_numpy() - best_reduction).round(2)
+    })
@@ -0,0 +1,230 @@
+"""Estimations pondérées issues des enquêtes tabac, avec intervalles de confiance.
+
+Les poids de réplication (bootstrap de Rao-Wu ou jackknife JKn) sont stockés
+sous forme de facteurs multiplicatifs par unité primaire (PSU) : une
+estimation agrège d'abord les répondants par cellule (groupe x PSU), puis
+évalue toutes les réplications en une seule opération matricielle. Le coût
+ne dépend donc du nombre de répondants que par l'agrégation initiale.
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+# Schéma des micro-données d'enquête (un répondant par ligne)
+MICRODATA_COLUMNS = ['territoire', 'annee', 'sexe', 'tranche_age', 'strate', 'psu', 'poids',
+                     'fumeur', 'fumeur_quotidien', 'pauvrete_tabac']
+
+AGE_BANDS = ['15-24', '25-34', '35-54', '55+']
+AGE_FACTORS = np.array([1.10, 1.20, 1.00, 0.70])  # risque relatif par tranche d'âge (moyenne 1)
+
+# Population approximative (15 ans et plus) servant au calage des poids
+TERRITORY_POPULATION = {
+    'Guadeloupe': 310000, 'Martinique': 290000, 'Guyane': 200000, 'La Réunion': 680000,
+    'Mayotte': 170000, 'Saint-Martin': 25000, 'Saint-Barthélemy': 8500,
+    'Polynésie française': 220000, 'Nouvelle-Calédonie': 210000
+}
+
+
+def replicate_factors(psu_strata, n_replicates=200, method='bootstrap', seed=0):
+    """Facteurs de réplication par PSU (P x R) et coefficients de variance (R,)
+
+    ``psu_strata`` donne le code de strate de chaque PSU, les PSU étant triées par strate.
+    """
+    psu_strata = np.asarray(psu_strata)
+    n_psu = len(psu_strata)
+    strata, stratum_start, stratum_size = np.unique(psu_strata, return_index=True, return_counts=True)
+    if (stratum_size < 2).any():
+        raise ValueError("Chaque strate doit contenir au moins deux PSU")
+    stratum_of_psu = np.searchsorted(strata, psu_strata)
+    inflation = stratum_size / (stratum_size - 1)
+
+    if method == 'jackknife':
+        # Réplication r : suppression de la PSU r, repondération des autres PSU de sa strate
+        same_stratum = stratum_of_psu[:, None] == stratum_of_psu[None, :]
+        factors = np.where(same_stratum, inflation[stratum_of_psu][None, :], 1.0)
+        np.fill_diagonal(factors, 0.0)
+        scale = 1 / inflation[stratum_of_psu]  # (n_h - 1) / n_h
+        return factors.astype(np.float32), scale
+
+    if method != 'bootstrap':
+        raise ValueError(f"Méthode de réplication inconnue: {method}")
+
+    # Rao-Wu : n_h - 1 tirages avec remise dans chaque strate, toutes réplications à la fois
+    draw_stratum = np.repeat(np.arange(len(strata)), stratum_size - 1)
+    rng = np.random.default_rng(seed)
+    offsets = (rng.random((n_replicates, len(draw_stratum))) * stratum_size[draw_stratum]).astype(np.int64)
+    drawn_psu = stratum_start[draw_stratum] + offsets
+    flat = (np.arange(n_replicates)[:, None] * n_psu + drawn_psu).ravel()
+    counts = np.bincount(flat, minlength=n_replicates * n_psu).reshape(n_replicates, n_psu).T
+    factors = counts * inflation[stratum_of_psu][:, None]
+    return factors.astype(np.float32), np.full(n_replicates, 1 / n_replicates)
+
+
+class SurveyDesign:
+    """Plan de sondage stratifié à deux degrés et ses poids de réplication"""
+
+    def __init__(self, microdata, n_replicates=200, method='bootstrap', seed=0,
+                 strata='strate', psu='psu', weight='poids'):
+        self.method = method
+        # Numérotation globale des PSU, triée par strate
+        grouped = microdata.groupby([strata, psu], sort=True)
+        psu_strata = grouped.size().index.get_level_values(0).to_numpy()
+
+        self.microdata = microdata.reset_index(drop=True)
+        self.psu_codes = grouped.ngroup().to_numpy()
+        self.weights = microdata[weight].to_numpy(dtype=np.float64)
+        self.factors, self.scale = replicate_factors(psu_strata, n_replicates, method, seed)
+
+    @property
+    def n_replicates(self):
+        return self.factors.shape[1]
+
+    def estimate(self, value, by=(), level=0.95):
+        """Pourcentage pondéré de ``value`` par groupe, avec erreur type et IC par réplication"""
+        by = list(by)
+        data = self.microdata
+        y = data[value].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(y)
+
+        if by:
+            grouped = data.loc[valid, by].groupby(by, sort=True)
+            group_codes = grouped.ngroup().to_numpy()
+            groups = grouped.size().index.to_frame(index=False)
+        else:
+            group_codes = np.zeros(valid.sum(), dtype=np.int64)
+            groups = pd.DataFrame(index=[0])
+
+        # Agrégation par cellule (groupe x PSU) : seule étape proportionnelle au nombre de répondants
+        n_psu = self.factors.shape[0]
+        psu = self.psu_codes[valid]
+        w = self.weights[valid]
+        cells, cell_index = np.unique(group_codes * n_psu + psu, return_inverse=True)
+        cell_w = np.bincount(cell_index, weights=w)
+        cell_wy = np.bincount(cell_index, weights=w * y[valid])
+        cell_n = np.bincount(cell_index)
+        cell_group = cells // n_psu
+        group_start = np.flatnonzero(np.r_[True, np.diff(cell_group) > 0])
+
+        # Toutes les réplications en une opération : (cellules x R) réduit par groupe
+        cell_factors = self.factors[cells % n_psu]
+        num = np.add.reduceat(cell_factors * cell_wy[:, None], group_start, axis=0)
+        den = np.add.reduceat(cell_factors * cell_w[:, None], group_start, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            replicates = num / den
+        theta = np.add.reduceat(cell_wy, group_start) / np.add.reduceat(cell_w, group_start)
+        deviations = np.nan_to_num(replicates - theta[:, None])
+        se = np.sqrt((deviations ** 2) @ self.scale)
+
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        result = groups.iloc[cell_group[group_start]].reset_index(drop=True)
+        result['estimation'] = 100 * theta
+        result['erreur_type'] = 100 * se
+        result['ic_bas'] = np.clip(100 * (theta - z * se), 0, 100)
+        result['ic_haut'] = np.clip(100 * (theta + z * se), 0, 100)
+        result['effectif'] = np.add.reduceat(cell_n, group_start)
+        return result
+
+
+def _calibrate(values, years, population, target):
+    """Met à l'échelle chaque année pour que la moyenne pondérée par la population égale ``target``"""
+    mean = pd.Series(values * population).groupby(years).sum() / pd.Series(population).groupby(years).sum()
+    return values * (target / mean).reindex(years).to_numpy()
+
+
+def survey_cells(territorial_history, historical_data, social_indicators, population=None):
+    """Paramètres de simulation par cellule territoire x année (une strate par cellule)
+
+    Les prévalences territoriales sont recalées chaque année pour que leur moyenne
+    pondérée par la population reproduise les séries nationales : l'enquête simulée
+    estime alors ``prevalence_tabac``, ``fumeurs_quotidiens``, ``tabagisme_feminin``
+    et ``pauvreté_tabac`` sans biais.
+    """
+    prevalence = territorial_history[territorial_history['indicateur'] == 'prevalence']
+    daily = territorial_history[territorial_history['indicateur'] == 'fumeurs_quotidiens']
+    cells = prevalence[['territoire', 'annee', 'valeur']].merge(
+        daily[['territoire', 'annee', 'valeur']], on=['territoire', 'annee'], suffixes=('', '_quotidien'))
+    population = population or TERRITORY_POPULATION
+    cells = cells[cells['territoire'].isin(list(population)) & cells['annee'].isin(historical_data['annee'])]
+    cell_population = cells['territoire'].map(population).to_numpy(dtype=float)
+
+    # Écart femmes / ensemble, prolongé avant 2010 par la première valeur connue
+    national = historical_data.set_index('annee')['prevalence_tabac']
+    national_daily = historical_data.set_index('annee')['fumeurs_quotidiens']
+    female = social_indicators.set_index('annee')['tabagisme_feminin'].reindex(national.index).bfill()
+    poverty = social_indicators.set_index('annee')['pauvreté_tabac']
+
+    # Calage annuel sur les séries nationales
+    years = cells['annee'].to_numpy()
+    prevalence = _calibrate(cells['valeur'].to_numpy(dtype=float), years, cell_population, national)
+    daily = _calibrate(cells['valeur_quotidien'].to_numpy(dtype=float), years, cell_population, national_daily)
+
+    return pd.DataFrame({
+        'territoire': cells['territoire'].to_numpy(dtype=object),
+        'annee': cells['annee'].to_numpy(),
+        'strate': (cells['territoire'] + '-' + cells['annee'].astype(str)).to_numpy(dtype=object),
+        'prevalence': prevalence / 100,
+        'part_quotidiens': daily / prevalence,
+        'ratio_femmes': (female / national).reindex(cells['annee']).to_numpy(),
+        'pauvrete': poverty.reindex(cells['annee']).to_numpy() / 100,
+        'population': cell_population
+    })
+
+
+def draw_cluster_effects(n_cells, psu_per_stratum, rng, sigma=0.15):
+    """Effets de grappe multiplicatifs (cellules x PSU), de moyenne exactement 1 par cellule"""
+    effects = np.exp(rng.normal(0, sigma, (n_cells, psu_per_stratum)))
+    return effects / effects.mean(axis=1, keepdims=True)
+
+
+def draw_respondents(cells, cell, cluster_effects, respondents, rng):
+    """Tire les répondants de façon vectorisée ; ``cell`` donne la cellule de chaque répondant
+
+    ``cluster_effects`` (cellules x PSU) porte l'effet de grappe et ``respondents``
+    l'effectif total de chaque cellule (tableau indexé par cellule, ou valeur commune),
+    qui sert au calcul des poids.
+    """
+    n = len(cell)
+    psu = rng.integers(0, cluster_effects.shape[1], n)
+    sexe = rng.integers(0, 2, n)  # 0 = F, 1 = H
+    age = rng.integers(0, len(AGE_BANDS), n)
+
+    # Probabilités individuelles : territoire x année, sexe, âge et effet de grappe
+    female_ratio = cells['ratio_femmes'].to_numpy()[cell]
+    sex_factor = np.where(sexe == 0, female_ratio, 2 - female_ratio)
+    p_smoker = cells['prevalence'].to_numpy()[cell] * sex_factor * AGE_FACTORS[age] * cluster_effects[cell, psu]
+    smoker = rng.random(n) < np.clip(p_smoker, 0, 0.95)
+    daily_smoker = smoker & (rng.random(n) < cells['part_quotidiens'].to_numpy()[cell])
+    poverty_rate = cells['pauvrete'].to_numpy()[cell]
+    poverty_smoker = np.where(np.isnan(poverty_rate), np.nan, rng.random(n) < poverty_rate)
+
+    # Poids : population / effectif, avec dispersion liée à la non-réponse (de moyenne 1)
+    cell_respondents = np.broadcast_to(respondents, len(cells))[cell]
+    weights = cells['population'].to_numpy()[cell] / cell_respondents * rng.lognormal(-0.25 ** 2 / 2, 0.25, n)
+
+    return pd.DataFrame({
+        'territoire': cells['territoire'].to_numpy()[cell],
+        'annee': cells['annee'].to_numpy()[cell],
+        'sexe': np.where(sexe == 0, 'F', 'H'),
+        'tranche_age': np.asarray(AGE_BANDS)[age],
+        'strate': cells['strate'].to_numpy()[cell],
+        'psu': psu,
+        'poids': weights.round(2),
+        'fumeur': smoker.astype(np.int8),
+        'fumeur_quotidien': daily_smoker.astype(np.int8),
+        'pauvrete_tabac': poverty_smoker
+    })
+
+
+def simulate_survey(territorial_history, historical_data, social_indicators,
+                    respondents=300, psu_per_stratum=10, seed=2023):
+    """Micro-données simulées, calées chaque année sur les séries nationales du dashboard
+
+    Une enquête par territoire et par année, stratifiée par territoire x année,
+    avec ``psu_per_stratum`` grappes et des poids calés sur la population.
+    """
+    rng = np.random.default_rng(seed)
+    cells = survey_cells(territorial_history, historical_data, social_indicators)
+    cluster_effects = draw_cluster_effects(len(cells), psu_per_stratum, rng)
+    cell = np.repeat(np.arange(len(cells)), respondents)
+    return draw_respondents(cells, cell, cluster_effects, respondents, rng)
@@ -0,0 +1,246 @@
+"""Générateur déterministe de données synthétiques au format du dashboard.
+
+Produit des micro-données d'enquête (un répondant par ligne) et les tables
+agrégées avec exactement les colonnes de ``historical_data``,
+``territorial_data``, ``territorial_history``, ``health_impact_data``,
+``social_indicators`` et ``policy_timeline``, à une échelle configurable.
+Les micro-données sont générées par blocs et écrites au fil de l'eau en
+Parquet : la mémoire utilisée ne dépend que de la taille d'un bloc.
+
+Usage:
+    python synthetic_data.py --output synthetic --units 50 --rows 100000000 --monthly
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from survey_estimation import TERRITORY_POPULATION, draw_cluster_effects, draw_respondents, survey_cells
+from territorial_data import territorial_history
+
+DROM_COM = list(TERRITORY_POPULATION)
+
+POLICY_TYPES = ['prevention', 'regulation', 'treatment']
+POLICY_TITLES = {
+    'prevention': ['Campagne de prévention', 'Programme scolaire', 'Génération sans tabac'],
+    'regulation': ['Hausse des prix du tabac', 'Interdiction de fumer', 'Contrôle des ventes'],
+    'treatment': ['Remboursement des substituts', 'Consultations de tabacologie', 'Téléconsultation sevrage']
+}
+
+# Colonnes de comptage (réparties sur les mois) des tables annuelles
+COUNT_COLUMNS = ['deces_tabac', 'cancers_poumon', 'bronchites_chroniques', 'infarctus', 'avc']
+
+# Répondants par bloc aléatoire : le tirage ne dépend pas de la taille des blocs écrits
+BLOCK_ROWS = 65536
+
+
+def territory_names(units):
+    """Les DROM-COM d'abord, puis des territoires fictifs numérotés"""
+    extra = [f'Territoire {i:05d}' for i in range(len(DROM_COM), units)]
+    return (DROM_COM + extra)[:units]
+
+
+def _trend(years, start, rate, rng, noise=0.005):
+    """Série à évolution exponentielle avec un léger bruit multiplicatif"""
+    t = np.asarray(years) - years[0]
+    return start * np.exp(rate * t) * rng.lognormal(0, noise, len(t))
+
+
+def generate_historical_data(years, rng):
+    """Même colonnes que ``initialize_historical_data``"""
+    prevalence = _trend(years, 35.2, -0.0133, rng)
+    return pd.DataFrame({
+        'annee': years,
+        'prevalence_tabac': prevalence.round(1),
+        'fumeurs_quotidiens': (prevalence * rng.uniform(0.80, 0.83, len(years))).round(1),
+        'cigarettes_par_jour': _trend(years, 12.8, -0.0086, rng).round(1),
+        'age_premiere_cigarette': _trend(years, 14.8, -0.0074, rng).round(1)
+    })
+
+
+def generate_territorial_data(names, national_prevalence, rng):
+    """Même colonnes que ``initialize_territorial_data`` (valeurs de la dernière année)"""
+    prevalence = national_prevalence * rng.lognormal(0, 0.15, len(names))
+    return pd.DataFrame({
+        'territoire': names,
+        'prevalence_2023': prevalence.round(1),
+        'fumeurs_quotidiens': (prevalence * rng.uniform(0.78, 0.85, len(names))).round(1),
+        'cigarettes_jour': (prevalence * rng.uniform(0.38, 0.44, len(names))).round(1),
+        'tabagisme_passif': (prevalence * rng.uniform(0.63, 0.72, len(names))).round(1),
+        'mortalite_tabac': (prevalence * rng.uniform(6.5, 7.3, len(names))).round(0).astype('int64'),
+        'prise_charge_tabac': rng.uniform(30, 60, len(names)).round(1)
+    })
+
+
+def generate_health_impact_data(years, rng):
+    """Même colonnes que ``initialize_health_impact_data``"""
+    return pd.DataFrame({
+        'annee': years,
+        'deces_tabac': _trend(years, 2850, -0.0115, rng).round(0).astype('int64'),
+        'cancers_poumon': _trend(years, 420, 0.0207, rng).round(0).astype('int64'),
+        'bronchites_chroniques': _trend(years, 1850, 0.0052, rng).round(0).astype('int64'),
+        'infarctus': _trend(years, 1250, -0.0084, rng).round(0).astype('int64'),
+        'avc': _trend(years, 980, -0.0110, rng).round(0).astype('int64')
+    })
+
+
+def generate_social_indicators(years, rng):
+    """Même colonnes que ``initialize_social_indicators``"""
+    return pd.DataFrame({
+        'annee': years,
+        'depenses_tabac_familles': _trend(years, 1250, 0.0208, rng).round(0).astype('int64'),
+        'absenteisme_tabac': _trend(years, 3.5, 0.0243, rng).round(1),
+        'tabagisme_feminin': _trend(years, 22.8, -0.0093, rng).round(1),
+        'pauvreté_tabac': _trend(years, 18.5, -0.0117, rng).round(1)
+    })
+
+
+def generate_policy_timeline(count, names, years, rng):
+    """Mesures au format de ``initialize_policy_timeline`` (liste de dicts)"""
+    start = pd.Timestamp(f'{years[0]}-01-01')
+    span = (pd.Timestamp(f'{years[-1]}-12-31') - start).days
+    dates = start + pd.to_timedelta(np.sort(rng.integers(0, span + 1, count)), unit='D')
+    types = rng.choice(POLICY_TYPES, count)
+    territories = rng.choice(names, count)
+    variants = rng.integers(0, 3, count)
+    return [
+        {'date': date.strftime('%Y-%m-%d'),
+         'type': policy_type,
+         'titre': f'{POLICY_TITLES[policy_type][variant]} ({territory})',
+         'description': f'Mesure synthétique n°{i + 1} appliquée à {territory}'}
+        for i, (date, policy_type, territory, variant)
+        in enumerate(zip(dates, types, territories, variants))
+    ]
+
+
+def split_counts(totals, profile):
+    """Répartit des totaux annuels entiers sur les mois (plus forts restes)
+
+    ``profile`` (années x 12) donne le poids relatif de chaque mois ; la somme des
+    douze mois est exactement le total annuel.
+    """
+    quotas = totals[:, None] * profile / profile.sum(axis=1, keepdims=True)
+    counts = np.floor(quotas).astype(np.int64)
+    remainders = totals - counts.sum(axis=1)
+    # Les unités restantes vont aux mois dont la partie fractionnaire est la plus grande
+    rank = np.argsort(np.argsort(counts - quotas, axis=1, kind='stable'), axis=1, kind='stable')
+    return counts + (rank < remainders[:, None])
+
+
+def expand_monthly(df):
+    """Passe une table annuelle au pas mensuel (colonne ``mois`` en plus)
+
+    Les taux sont interpolés linéairement entre deux années ; les comptages sont
+    répartis sur les douze mois en conservant le total annuel. Les colonnes entières
+    le restent.
+    """
+    months = np.tile(np.arange(1, 13), len(df))
+    position = np.repeat(np.arange(len(df)), 12) + (months - 1) / 12
+    monthly = pd.DataFrame({'annee': np.repeat(df['annee'].to_numpy(), 12), 'mois': months})
+    for column in df.columns.drop('annee'):
+        values = np.interp(position, np.arange(len(df)), df[column].to_numpy(dtype=float))
+        if column in COUNT_COLUMNS:
+            monthly[column] = split_counts(df[column].to_numpy(dtype=np.int64), values.reshape(-1, 12)).ravel()
+        elif pd.api.types.is_integer_dtype(df[column]):
+            monthly[column] = values.round(0).astype('int64')
+        else:
+            monthly[column] = values.round(2)
+    return monthly
+
+
+def write_microdata(path, cells, rows, chunk_rows, psu_per_stratum, seed):
+    """Écrit ``rows`` répondants en Parquet, par groupes de blocs
+
+    Chaque bloc de ``BLOCK_ROWS`` répondants a son propre générateur aléatoire dérivé de
+    (seed, numéro de bloc) : le résultat ne dépend que de la graine, ``chunk_rows`` fixant
+    seulement le nombre de répondants écrits à la fois (arrondi à un nombre entier de blocs).
+    """
+    per_cell = -(-rows // len(cells))  # arrondi supérieur : la dernière cellule peut être incomplète
+    respondents = np.clip(rows - np.arange(len(cells)) * per_cell, 0, per_cell)  # effectif réel par cellule
+    cluster_effects = draw_cluster_effects(len(cells), psu_per_stratum, np.random.default_rng([seed, 0]))
+    chunk_rows = max(chunk_rows // BLOCK_ROWS, 1) * BLOCK_ROWS
+    writer = None
+    try:
+        for chunk_start in range(0, rows, chunk_rows):
+            frames = []
+            for start in range(chunk_start, min(chunk_start + chunk_rows, rows), BLOCK_ROWS):
+                rng = np.random.default_rng([seed, 1, start // BLOCK_ROWS])
+                cell = np.arange(start, min(start + BLOCK_ROWS, rows)) // per_cell
+                frames.append(draw_respondents(cells, cell, cluster_effects, respondents, rng))
+            table = pa.Table.from_pandas(pd.concat(frames, ignore_index=True), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def generate(output_dir, units=9, start_year=2000, end_year=2023, monthly=False,
+             rows=1_000_000, policies=200, chunk_rows=1_000_000, psu_per_stratum=10, seed=42):
+    """Génère l'ensemble des tables dans ``output_dir``"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng([seed, 2])
+    years = np.arange(start_year, end_year + 1)
+    names = territory_names(units)
+
+    historical_data = generate_historical_data(years, rng)
+    territorial_data = generate_territorial_data(names, historical_data['prevalence_tabac'].iloc[-1], rng)
+    health_impact_data = generate_health_impact_data(years, rng)
+    social_indicators = generate_social_indicators(years, rng)
+    policy_timeline = generate_policy_timeline(policies, names, years, rng)
+
+    # Micro-données annuelles, calées sur les tables agrégées
+    population = dict(TERRITORY_POPULATION)
+    population.update(zip(names[len(DROM_COM):], rng.integers(5000, 900000, max(units - len(DROM_COM), 0))))
+    # Historique territorial : tendance propre à chaque territoire, pour que les écarts évoluent
+    history = territorial_history(territorial_data, historical_data)
+    drift = history['territoire'].map(dict(zip(names, rng.normal(0, 0.01, units))))
+    history['valeur'] = (history['valeur'] * np.exp(drift * (history['annee'] - end_year))).round(1)
+
+    cells = survey_cells(history, historical_data, social_indicators, population)
+    if rows:
+        write_microdata(os.path.join(output_dir, 'survey_microdata.parquet'),
+                        cells, rows, chunk_rows, psu_per_stratum, seed)
+
+    if monthly:
+        historical_data = expand_monthly(historical_data)
+        health_impact_data = expand_monthly(health_impact_data)
+        social_indicators = expand_monthly(social_indicators)
+
+    historical_data.to_parquet(os.path.join(output_dir, 'historical_data.parquet'), index=False)
+    territorial_data.to_parquet(os.path.join(output_dir, 'territorial_data.parquet'), index=False)
+    history.to_parquet(os.path.join(output_dir, 'territorial_history.parquet'), index=False)
+    health_impact_data.to_parquet(os.path.join(output_dir, 'health_impact_data.parquet'), index=False)
+    social_indicators.to_parquet(os.path.join(output_dir, 'social_indicators.parquet'), index=False)
+    with open(os.path.join(output_dir, 'policy_timeline.json'), 'w', encoding='utf-8') as f:
+        json.dump(policy_timeline, f, ensure_ascii=False, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des données synthétiques au format du dashboard")
+    parser.add_argument('--output', default='synthetic', help="Répertoire de sortie")
+    parser.add_argument('--units', type=int, default=9, help="Nombre de territoires")
+    parser.add_argument('--start-year', type=int, default=2000)
+    parser.add_argument('--end-year', type=int, default=2023)
+    parser.add_argument('--monthly', action='store_true', help="Tables temporelles au pas mensuel")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Nombre de répondants (0 : aucun)")
+    parser.add_argument('--policies', type=int, default=200, help="Nombre de mesures de politique")
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000,
+                        help="Répondants écrits à la fois (arrondi à un multiple de 65536)")
+    parser.add_argument('--psu', type=int, default=10, help="Grappes (PSU) par strate")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.output, units=args.units, start_year=args.start_year, end_year=args.end_year,
+             monthly=args.monthly, rows=args.rows, policies=args.policies,
+             chunk_rows=args.chunk_rows, psu_per_stratum=args.psu, seed=args.seed)
+    print(f"Données synthétiques écrites dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Historique des indicateurs territoriaux (territoire x année x indicateur, format long)."""
+import numpy as np
+import pandas as pd
+
+# Schéma de l'historique territorial (un indicateur d'un territoire pour une année par ligne)
+HISTORY_COLUMNS = ['territoire', 'annee', 'indicateur', 'valeur']
+
+# Indicateurs indispensables à la carte et à l'enquête simulée
+REQUIRED_INDICATORS = ['prevalence', 'fumeurs_quotidiens']
+
+
+def read_territorial_history(path):
+    """Charge un historique territorial au format long depuis un fichier Parquet ou CSV"""
+    if path.endswith('.parquet'):
+        history = pd.read_parquet(path)
+    else:
+        history = pd.read_csv(path)
+    missing = [column for column in HISTORY_COLUMNS if column not in history.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans {path}: {', '.join(missing)}")
+    history = history[HISTORY_COLUMNS].dropna()
+    missing = [name for name in REQUIRED_INDICATORS if name not in set(history['indicateur'])]
+    if missing:
+        raise ValueError(f"Indicateurs manquants dans {path}: {', '.join(missing)}")
+    history = history.astype({'territoire': object, 'annee': 'int64', 'indicateur': object, 'valeur': float})
+    return history.sort_values(['indicateur', 'territoire', 'annee'], ignore_index=True)
+
+
+def territorial_history(territorial_data, historical_data):
+    """Historique extrapolé des indicateurs territoriaux, à défaut de données annuelles réelles
+
+    Chaque territoire suit la tendance nationale de l'indicateur, calée sur sa valeur
+    de la dernière année de ``historical_data`` (celle de ``territorial_data``) : les
+    écarts relatifs entre territoires sont donc les mêmes chaque année.
+    """
+    national = historical_data.set_index('annee')
+    trends = {
+        'prevalence_2023': national['prevalence_tabac'],
+        'fumeurs_quotidiens': national['fumeurs_quotidiens'],
+        'cigarettes_jour': national['cigarettes_par_jour'],
+        'tabagisme_passif': national['prevalence_tabac'],
+        'mortalite_tabac': national['prevalence_tabac'],
+        # La prise en charge progresse à mesure que la prévalence recule
+        'prise_charge_tabac': 1 / national['prevalence_tabac']
+    }
+
+    years = national.index.to_numpy()
+    territories = territorial_data['territoire'].to_numpy()
+    frames = []
+    for column, trend in trends.items():
+        ratios = (trend / trend.iloc[-1]).to_numpy()
+        values = territorial_data[column].to_numpy()[:, None] * ratios[None, :]
+        frames.append(pd.DataFrame({
+            'territoire': np.repeat(territories, len(years)),
+            'annee': np.tile(years, len(territories)),
+            'indicateur': column.replace('_2023', ''),
+            'valeur': values.ravel().round(1)
+        }))
+    return pd.concat(frames, ignore_index=True)
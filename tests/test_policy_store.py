@@ -0,0 +1,117 @@
+"""Requêtes par intervalles du référentiel de mesures, comparées à un filtrage pandas direct"""
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from policy_store import PolicyEventStore
+
+TERRITORIES = ['Tous', 'Guadeloupe', 'Martinique', 'Guyane']
+
+
+@pytest.fixture(scope='module')
+def store():
+    """500 mesures aléatoires, dont certaines sans date de fin"""
+    rng = np.random.default_rng(7)
+    starts = pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 8000, 500), unit='D')
+    durations = pd.to_timedelta(rng.integers(0, 3000, 500), unit='D')
+    ends = pd.Series(starts + durations).where(rng.random(500) < 0.7)
+    store = PolicyEventStore()
+    store.add_events({
+        'date_debut': starts.strftime('%Y-%m-%d'),
+        'date_fin': ends.dt.strftime('%Y-%m-%d'),
+        'territoire': rng.choice(TERRITORIES, 500),
+        'type': rng.choice(['prevention', 'regulation', 'treatment'], 500),
+        'titre': [f'Mesure {i}' for i in range(500)],
+    }, persist=False)
+    return store
+
+
+def territory_filter(events, territoire):
+    if territoire is None or territoire == PolicyEventStore.NATIONAL:
+        return pd.Series(True, index=events.index)
+    return events['territoire'].isin([territoire, PolicyEventStore.NATIONAL])
+
+
+PERIODS = [('2005-03-01', '2005-03-01'), ('2003-01-01', '2010-06-30'), ('1990-01-01', '1999-12-31'),
+           ('2018-07-14', '2030-01-01')]
+
+
+@pytest.mark.parametrize('territoire', [None, 'Tous', 'Guadeloupe', 'Guyane'])
+@pytest.mark.parametrize('debut, fin', PERIODS)
+def test_active_between(store, debut, fin, territoire):
+    events = store.events
+    expected = events[(events['date_debut'] <= fin) & (events['date_fin'] >= debut) &
+                      territory_filter(events, territoire)]
+    pd.testing.assert_frame_equal(store.active_between(debut, fin, territoire), expected)
+
+
+@pytest.mark.parametrize('territoire', [None, 'Martinique'])
+@pytest.mark.parametrize('debut, fin', PERIODS)
+def test_started_between(store, debut, fin, territoire):
+    events = store.events
+    expected = events[(events['date_debut'] >= debut) & (events['date_debut'] <= fin) &
+                      territory_filter(events, territoire)]
+    pd.testing.assert_frame_equal(store.started_between(debut, fin, territoire), expected)
+
+
+@pytest.mark.parametrize('territoire', [None, 'Guadeloupe'])
+@pytest.mark.parametrize('date, months', [('2010-01-01', 24), ('2020-06-15', 6), ('2001-01-01', 120)])
+def test_changes_before(store, date, months, territoire):
+    events = store.events[territory_filter(store.events, territoire)]
+    fin = pd.Timestamp(date)
+    debut = fin - pd.DateOffset(months=months)
+    started = events[events['date_debut'].between(debut, fin)].assign(
+        changement='début', date_changement=lambda df: df['date_debut'])
+    ended = events[events['date_fin'].between(debut, fin)].assign(
+        changement='fin', date_changement=lambda df: df['date_fin'])
+    expected = pd.concat([started, ended]).sort_values(['date_changement', 'changement', 'titre'])
+
+    changes = store.changes_before(date, months, territoire)
+    assert changes['date_changement'].is_monotonic_increasing
+    columns = ['date_changement', 'changement', 'titre', 'territoire']
+    pd.testing.assert_frame_equal(
+        changes.sort_values(['date_changement', 'changement', 'titre'])[columns].reset_index(drop=True),
+        expected[columns].reset_index(drop=True), check_dtype=False)
+
+
+def test_import_csv_renames_date():
+    store = PolicyEventStore()
+    csv = io.StringIO("date,territoire,type,titre\n"
+                      "2015-04-01,Mayotte,prevention,Programme scolaire\n"
+                      "2012-09-01,,regulation,Hausse des prix\n")
+    assert store.import_csv(csv, persist=False) == 2
+    events = store.events
+    assert events['date_debut'].tolist() == [pd.Timestamp('2012-09-01'), pd.Timestamp('2015-04-01')]
+    assert events['territoire'].tolist() == [PolicyEventStore.NATIONAL, 'Mayotte']
+    assert (events['date_fin'] == PolicyEventStore.OPEN_END).all()
+
+
+def test_import_json_keeps_date_debut():
+    store = PolicyEventStore()
+    records = [{'date': '2001-01-01', 'date_debut': '2019-03-01', 'date_fin': '2021-03-01',
+                'territoire': 'Guyane', 'type': 'treatment', 'titre': 'Téléconsultation'}]
+    store.import_json(io.StringIO(json.dumps(records)), persist=False)
+    assert store.events['date_debut'].tolist() == [pd.Timestamp('2019-03-01')]
+    assert len(store.active_in('Guyane', 2020)) == 1
+    assert len(store.active_in('Guyane', 2022)) == 0
+
+
+def test_import_invalid_date_leaves_store_unchanged():
+    store = PolicyEventStore()
+    store.import_csv(io.StringIO("date_debut,titre\n2015-04-01,Mesure valide\n"), persist=False)
+    with pytest.raises(ValueError):
+        store.import_csv(io.StringIO("date_debut,titre\npas une date,Mesure invalide\n"), persist=False)
+    assert store.events['titre'].tolist() == ['Mesure valide']
+
+
+def test_save_and_reload(tmp_path):
+    path = tmp_path / 'policy_events.json'
+    store = PolicyEventStore(str(path))
+    store.add_events([{'date': '2016-09-01', 'type': 'treatment', 'titre': 'Substituts remboursés'},
+                      {'date': '2007-01-01', 'date_fin': '2010-12-31', 'territoire': 'Martinique',
+                       'type': 'regulation', 'titre': 'Interdiction'}])
+    reloaded = PolicyEventStore(str(path))
+    pd.testing.assert_frame_equal(reloaded.events, store.events, check_dtype=False)
@@ -0,0 +1,138 @@
+"""Régulation des reruns, budgets mémoire, expiration des sessions et métriques Prometheus"""
+import sys
+
+import pandas as pd
+import pytest
+
+import session_guard
+from session_guard import SessionGuard, estimate_size
+
+PAYLOAD = 1000  # octets utiles par artefact de test
+
+
+class Clock:
+    """Horloge monotone contrôlée par le test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_guard.time, 'monotonic', clock)
+    return clock
+
+
+def artifact():
+    return b'x' * PAYLOAD
+
+
+def test_burst_is_throttled(clock):
+    guard = SessionGuard(max_reruns=3, window=2.0, debounce=0)
+    assert [guard.begin_rerun('a') for _ in range(5)] == [False, False, False, True, True]
+    assert guard.reruns_throttled == 2
+    assert guard.reruns_coalesced == 4  # aucun rerun n'a atteint end_rerun
+
+    # Hors de la fenêtre, la session n'est plus temporisée
+    clock.now += 2.5
+    assert guard.begin_rerun('a') is False
+    assert guard.begin_rerun('b') is False
+
+
+def test_session_lru_eviction(clock):
+    size = sys.getsizeof(artifact())
+    guard = SessionGuard(session_budget=3 * size, global_budget=100 * size)
+    for key in ['a', 'b', 'c']:
+        guard.remember('s', key, artifact)
+    guard.remember('s', 'a', lambda: pytest.fail("artefact déjà en cache"))  # 'a' redevient récent
+    guard.remember('s', 'd', artifact)
+
+    assert list(guard.sessions['s'].artifacts) == ['c', 'a', 'd']
+    assert guard.evictions == 1
+
+
+def test_session_state_counts_against_budget(clock):
+    size = sys.getsizeof(artifact())
+    guard = SessionGuard(session_budget=4 * size, global_budget=100 * size)
+    for key in ['a', 'b', 'c']:
+        guard.remember('s', key, artifact)
+    guard.begin_rerun('s')
+    guard.end_rerun('s', {'historique': [artifact(), artifact()]})
+
+    # st.session_state n'est pas évincé : ce sont les artefacts les plus anciens qui cèdent la place
+    assert list(guard.sessions['s'].artifacts) == ['c']
+    assert guard.sessions['s'].memory_bytes <= 4 * size + sys.getsizeof([])
+
+
+def test_global_budget_evicts_largest_session(clock):
+    size = sys.getsizeof(artifact())
+    guard = SessionGuard(session_budget=100 * size, global_budget=5 * size)
+    for key in ['a', 'b', 'c']:
+        guard.remember('gros', key, artifact)
+    guard.remember('petit', 'a', artifact)
+    guard.remember('petit', 'b', artifact)
+    guard.remember('petit', 'c', artifact)
+
+    assert list(guard.sessions['gros'].artifacts) == ['b', 'c']
+    assert list(guard.sessions['petit'].artifacts) == ['a', 'b', 'c']
+    assert guard.evictions == 1
+
+
+def test_shared_resources_are_not_charged(clock):
+    guard = SessionGuard()
+    shared = guard.share(pd.DataFrame({'valeur': range(10000)}))
+    holder = type('Holder', (), {})()
+    holder.data = shared
+    assert estimate_size(holder, guard.shared_ids) < estimate_size(holder)
+    guard.remember('s', 'holder', lambda: holder)
+    assert guard.sessions['s'].artifacts_bytes < 1000
+
+
+def test_idle_sessions_expire(clock):
+    guard = SessionGuard(session_ttl=60)
+    guard.begin_rerun('interrompue')  # jamais terminée
+    guard.begin_rerun('active')
+    guard.end_rerun('active')
+
+    clock.now += 45
+    guard.begin_rerun('active')
+    guard.end_rerun('active')
+    clock.now += 30
+    guard.begin_rerun('nouvelle')
+    assert sorted(guard.sessions) == ['active', 'nouvelle']
+
+
+def metric(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + ' '):
+            return float(line.split()[-1])
+    raise AssertionError(f"métrique absente: {name}")
+
+
+def test_render_metrics(clock):
+    guard = SessionGuard(max_reruns=10)
+    for duration in [0.05, 0.3, 0.3, 20.0]:
+        guard.begin_rerun('s')
+        clock.now += duration
+        guard.end_rerun('s')
+
+    # Artefacts mesurés au moment de la collecte, sans attendre la fin d'un rerun
+    guard.remember('t', 'a', artifact)
+    text = guard.render_metrics()
+
+    assert metric(text, 'dashboard_reruns_total') == 4
+    assert metric(text, 'dashboard_sessions_active') == 2
+    assert metric(text, 'dashboard_session_memory_bytes{session="t"}') == sys.getsizeof(artifact())
+    assert metric(text, 'dashboard_memory_bytes') == sys.getsizeof(artifact())
+    assert '# TYPE dashboard_rerun_duration_seconds histogram' in text
+    assert metric(text, 'dashboard_rerun_duration_seconds_bucket{le="0.1"}') == 1
+    assert metric(text, 'dashboard_rerun_duration_seconds_bucket{le="0.5"}') == 3
+    assert metric(text, 'dashboard_rerun_duration_seconds_bucket{le="10.0"}') == 3
+    assert metric(text, 'dashboard_rerun_duration_seconds_bucket{le="+Inf"}') == 4
+    assert metric(text, 'dashboard_rerun_duration_seconds_count') == 4
+    assert metric(text, 'dashboard_rerun_duration_seconds_sum') == pytest.approx(20.65)
+    assert text.endswith('\n')
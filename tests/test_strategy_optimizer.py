@@ -0,0 +1,58 @@
+"""Optimiseur de portefeuille comparé à une énumération naïve des combinaisons"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategy_optimizer import MAX_STRATEGIES, optimize_portfolio
+
+
+def make_inputs(n_strategies, seed):
+    rng = np.random.default_rng(seed)
+    strategies = pd.DataFrame({
+        'strategie': [f'Stratégie {i}' for i in range(n_strategies)],
+        'efficacite': rng.uniform(3, 9, n_strategies).round(1),
+        'cout': rng.integers(1, 8, n_strategies),
+        'acceptabilite': rng.integers(3, 10, n_strategies),
+    })
+    territories = pd.DataFrame({'territoire': ['A', 'B', 'C', 'D'],
+                                'prevalence_2023': rng.uniform(20, 40, 4).round(1)})
+    return strategies, territories
+
+
+def brute_force(strategies, prevalence, budget, min_acceptabilite, max_strategies):
+    """Meilleure baisse de prévalence et coût minimal associé, combinaison par combinaison"""
+    best = (0.0, 0.0)
+    for size in range(1, max_strategies + 1):
+        for combo in combinations(strategies.itertuples(), size):
+            cost = sum(s.cout for s in combo)
+            if cost > budget or any(s.acceptabilite < min_acceptabilite for s in combo):
+                continue
+            reduction = prevalence * (1 - np.prod([1 - s.efficacite / 100 for s in combo]))
+            if reduction > best[0] + 1e-9 or (abs(reduction - best[0]) <= 1e-9 and cost < best[1]):
+                best = (reduction, cost)
+    return best
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('budget, min_acceptabilite, max_strategies',
+                         [(12, 5, 3), (6, 0, 7), (30, 7, 2), (0, 5, 3)])
+def test_matches_brute_force(seed, budget, min_acceptabilite, max_strategies):
+    strategies, territories = make_inputs(7, seed)
+    caps = {'B': budget / 2, 'D': budget + 10}  # un plafond supérieur au budget reste borné par le budget
+    result = optimize_portfolio(strategies, territories, budget, min_acceptabilite, max_strategies, caps)
+
+    for row, territory in zip(result.itertuples(), territories.itertuples()):
+        cap = min(caps.get(territory.territoire, budget), budget)
+        reduction, cost = brute_force(strategies, territory.prevalence_2023, cap,
+                                      min_acceptabilite, max_strategies)
+        assert row.reduction_prevalence == pytest.approx(round(reduction, 2))
+        assert row.cout == cost
+        assert row.cout <= cap and row.nb_strategies <= max_strategies
+
+
+def test_rejects_too_many_strategies():
+    strategies, territories = make_inputs(MAX_STRATEGIES + 1, 0)
+    with pytest.raises(ValueError):
+        optimize_portfolio(strategies, territories, 10, 5, 3)
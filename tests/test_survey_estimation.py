@@ -0,0 +1,109 @@
+"""Estimations par réplication comparées à un calcul naïf, et calage de l'enquête simulée"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from survey_estimation import SurveyDesign, replicate_factors, survey_cells
+from territorial_data import territorial_history
+
+
+def make_microdata(seed=1):
+    """Petit échantillon : trois strates de 3 à 5 PSU, deux groupes"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for stratum, n_psu in zip(['A', 'B', 'C'], [3, 4, 5]):
+        for psu in range(n_psu):
+            n = rng.integers(5, 12)
+            rows.append(pd.DataFrame({
+                'strate': stratum,
+                'psu': psu,
+                'poids': rng.uniform(1, 5, n),
+                'groupe': rng.choice(['x', 'y'], n),
+                'fumeur': (rng.random(n) < 0.3).astype(float)
+            }))
+    return pd.concat(rows, ignore_index=True)
+
+
+def naive_estimate(data, replicate_weights, scale):
+    """Proportion pondérée et erreur type, en recalculant l'estimateur pour chaque réplication"""
+    theta = np.average(data['fumeur'], weights=data['poids'])
+    replicates = np.array([np.average(data['fumeur'], weights=w) for w in replicate_weights])
+    return 100 * theta, 100 * np.sqrt(np.sum(scale * (replicates - theta) ** 2))
+
+
+def test_bootstrap_factors_keep_stratum_totals():
+    strata = np.repeat([0, 1, 2], [3, 4, 5])
+    factors, scale = replicate_factors(strata, n_replicates=50, method='bootstrap', seed=3)
+    for stratum, n_h in zip([0, 1, 2], [3, 4, 5]):
+        np.testing.assert_allclose(factors[strata == stratum].sum(axis=0), n_h, rtol=1e-6)
+    np.testing.assert_allclose(scale, 1 / 50)
+
+
+@pytest.mark.parametrize('by', [(), ('groupe',)])
+def test_bootstrap_matches_naive(by):
+    data = make_microdata()
+    design = SurveyDesign(data, n_replicates=50, method='bootstrap', seed=3)
+    result = design.estimate('fumeur', by)
+
+    groups = data.groupby(list(by)) if by else [((), data)]
+    for i, (_, group) in enumerate(groups):
+        codes = design.psu_codes[group.index]
+        replicate_weights = [group['poids'].to_numpy() * design.factors[codes, r]
+                             for r in range(design.n_replicates)]
+        theta, se = naive_estimate(group, replicate_weights, design.scale)
+        assert result['estimation'][i] == pytest.approx(theta)
+        assert result['erreur_type'][i] == pytest.approx(se, rel=1e-5)
+        assert result['effectif'][i] == len(group)
+
+
+@pytest.mark.parametrize('by', [(), ('groupe',)])
+def test_jackknife_matches_definition(by):
+    data = make_microdata()
+    design = SurveyDesign(data, method='jackknife')
+    result = design.estimate('fumeur', by)
+
+    # JKn : la PSU supprimée a un poids nul, les autres PSU de sa strate sont repondérées
+    # par n_h / (n_h - 1) ; coefficient (n_h - 1) / n_h par réplication
+    psus = data[['strate', 'psu']].drop_duplicates().sort_values(['strate', 'psu']).to_numpy()
+    n_h = data.groupby('strate')['psu'].nunique()
+    groups = data.groupby(list(by)) if by else [((), data)]
+    for i, (_, group) in enumerate(groups):
+        replicate_weights, scale = [], []
+        for stratum, psu in psus:
+            in_stratum = (group['strate'] == stratum).to_numpy()
+            deleted = in_stratum & (group['psu'] == psu).to_numpy()
+            factor = np.where(deleted, 0.0, np.where(in_stratum, n_h[stratum] / (n_h[stratum] - 1), 1.0))
+            replicate_weights.append(group['poids'].to_numpy() * factor)
+            scale.append((n_h[stratum] - 1) / n_h[stratum])
+        theta, se = naive_estimate(group, replicate_weights, np.array(scale))
+        assert result['estimation'][i] == pytest.approx(theta)
+        assert result['erreur_type'][i] == pytest.approx(se, rel=1e-5)
+
+
+def test_simulated_cells_match_national_series():
+    years = np.arange(2020, 2024)
+    historical = pd.DataFrame({'annee': years,
+                               'prevalence_tabac': [28.0, 27.5, 27.0, 26.0],
+                               'fumeurs_quotidiens': [23.0, 22.6, 22.1, 21.6],
+                               'cigarettes_par_jour': [11.0, 10.9, 10.7, 10.5]})
+    social = pd.DataFrame({'annee': years,
+                           'tabagisme_feminin': [21.0, 20.8, 20.5, 20.2],
+                           'pauvreté_tabac': [17.0, 16.5, 16.2, 15.9]})
+    territorial = pd.DataFrame({'territoire': ['A', 'B', 'C'],
+                                'prevalence_2023': [24.0, 31.0, 38.0],
+                                'fumeurs_quotidiens': [19.0, 26.0, 33.0],
+                                'cigarettes_jour': [10.0, 12.0, 15.0],
+                                'tabagisme_passif': [15.0, 20.0, 27.0],
+                                'mortalite_tabac': [150, 200, 280],
+                                'prise_charge_tabac': [50.0, 45.0, 40.0]})
+    cells = survey_cells(territorial_history(territorial, historical), historical, social,
+                         population={'A': 500000, 'B': 200000, 'C': 10000})
+
+    # Moyennes pondérées par la population : égales aux séries nationales chaque année
+    weighted = cells.assign(p=cells['prevalence'] * cells['population'],
+                            d=cells['prevalence'] * cells['part_quotidiens'] * cells['population'])
+    totals = weighted.groupby('annee')[['p', 'd', 'population']].sum()
+    np.testing.assert_allclose(100 * totals['p'] / totals['population'], historical['prevalence_tabac'])
+    np.testing.assert_allclose(100 * totals['d'] / totals['population'], historical['fumeurs_quotidiens'])
+    female = cells.groupby('annee')['ratio_femmes'].first() * historical['prevalence_tabac'].to_numpy()
+    np.testing.assert_allclose(female, social['tabagisme_feminin'])